@@ -0,0 +1,114 @@
+"""
+Offline batch evaluation runner.
+Streams questions from a JSONL file through the 4-stage pipeline on a bounded worker pool
+and appends one JSONL result per question as soon as it finishes, so an interrupted run
+can be resumed where it stopped.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterator, Set, Tuple
+
+QUESTION_FIELDS = ('question', 'input', 'query', 'body', 'title')
+ID_FIELDS = ('id', 'question_id', 'request_id')
+
+def iter_questions(questions_path: str) -> Iterator[Tuple[str, str]]:
+    """Yield (question_id, question) pairs lazily from a JSONL file"""
+    with open(questions_path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            question = next((record[field] for field in QUESTION_FIELDS if record.get(field)), None)
+            if question is None:
+                raise ValueError(f"{questions_path}:{line_number} has none of the fields {', '.join(QUESTION_FIELDS)}")
+            question_id = next((str(record[field]) for field in ID_FIELDS if record.get(field) is not None), str(line_number))
+            yield question_id, question
+
+def load_completed_ids(output_path: str) -> Set[str]:
+    """Collect ids already finished in a previous run and repair a torn trailing line"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    
+    with open(output_path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            # The process died mid-write; drop the partial record so appends stay valid JSONL
+            f.truncate(data.rfind(b'\n') + 1)
+            data = data[:data.rfind(b'\n') + 1]
+    
+    for line in data.decode('utf-8').splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        # Failed questions are retried on resume
+        if record.get('status') != 'failed':
+            completed.add(record['id'])
+    return completed
+
+def evaluate_question(evaluator, question_id: str, question: str) -> Dict[str, Any]:
+    """Run one question through the pipeline and shape it into a result record"""
+    started = time.time()
+    try:
+        result = evaluator.comprehensive_evaluate(question)
+    except Exception as e:
+        result = {'error': str(e), 'failed': True}
+    
+    if result.get('blocked'):
+        status = 'blocked'
+    elif 'error' in result:
+        status = 'failed'
+    else:
+        status = 'ok'
+    return {
+        'id': question_id,
+        'question': question,
+        'status': status,
+        'wall_time': time.time() - started,
+        'result': result
+    }
+
+def run_batch(evaluator, questions_path: str, output_path: str, concurrency: int = 4) -> Dict[str, Any]:
+    """Evaluate every question in questions_path, writing results to output_path as they finish"""
+    completed_ids = load_completed_ids(output_path)
+    evaluator.show_progress = False
+    stats = {'ok': 0, 'blocked': 0, 'failed': 0, 'skipped': 0}
+    start_time = time.time()
+    
+    def write_result(out, record):
+        out.write(json.dumps(record, default=str) + "\n")
+        out.flush()
+        stats[record['status']] += 1
+        print(f"   [{record['status']}] {record['id']} ({record['wall_time']:.2f}s)")
+    
+    # Keep at most two questions per worker in flight so huge files are never fully loaded
+    max_in_flight = max(1, concurrency) * 2
+    with open(output_path, 'a', encoding='utf-8') as out, \
+            ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch") as pool:
+        pending = set()
+        for question_id, question in iter_questions(questions_path):
+            if question_id in completed_ids:
+                stats['skipped'] += 1
+                continue
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write_result(out, future.result())
+            pending.add(pool.submit(evaluate_question, evaluator, question_id, question))
+        
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                write_result(out, future.result())
+        os.fsync(out.fileno())
+    
+    elapsed = time.time() - start_time
+    processed = stats['ok'] + stats['blocked'] + stats['failed']
+    stats['elapsed_seconds'] = elapsed
+    stats['questions_per_second'] = processed / elapsed if elapsed > 0 else 0.0
+    return stats
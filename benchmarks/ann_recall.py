@@ -0,0 +1,94 @@
+"""Recall@k and latency of the IVF index against exact cosine search.
+
+Runs on synthetic clustered embeddings (no API calls), or on a saved NumPy store:
+
+    python -m benchmarks.ann_recall --rows 200000 --dim 768 --nprobe 1 4 8 16 32
+    python -m benchmarks.ann_recall --store .vector_store/numpy_<key>
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from utils.ann_index import IVFIndex
+from utils.numpy_index import MATRIX_FILE, _normalize, _top_k
+
+def synthetic_corpus(rows: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Gaussian blobs around random directions, roughly like topic-clustered chunk embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = _normalize(rng.standard_normal((clusters, dim)).astype(np.float32))
+    labels = rng.integers(0, clusters, size=rows)
+    noise = rng.standard_normal((rows, dim)).astype(np.float32) * (0.6 / np.sqrt(dim))
+    return _normalize(centers[labels] + noise)
+
+def sample_queries(matrix: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    """Perturbed corpus rows, so every query has true near neighbours"""
+    rng = np.random.default_rng(seed)
+    rows = np.asarray(matrix[rng.choice(len(matrix), size=count, replace=False)])
+    noise = rng.standard_normal(rows.shape).astype(np.float32) * (0.3 / np.sqrt(matrix.shape[1]))
+    return _normalize(rows + noise)
+
+def run(matrix, queries, k, nlist, nprobes):
+    exact_start = time.perf_counter()
+    truth = [set(_top_k(matrix @ query, k).tolist()) for query in queries]
+    exact_ms = (time.perf_counter() - exact_start) * 1000 / len(queries)
+
+    index = IVFIndex(nlist=nlist)
+    train_start = time.perf_counter()
+    index.train(matrix)
+    train_seconds = time.perf_counter() - train_start
+
+    results = []
+    for nprobe in nprobes:
+        hits = 0
+        scanned = 0
+        start = time.perf_counter()
+        for query, expected in zip(queries, truth):
+            positions = index.candidates(query, nprobe)
+            found = positions[_top_k(matrix[positions] @ query, k)]
+            hits += len(expected.intersection(found.tolist()))
+            scanned += len(positions)
+        results.append({
+            'nprobe': nprobe,
+            f'recall@{k}': hits / (k * len(queries)),
+            'latency_ms': (time.perf_counter() - start) * 1000 / len(queries),
+            'scanned_fraction': scanned / (len(queries) * len(matrix)),
+        })
+    return {
+        'rows': len(matrix), 'dim': matrix.shape[1], 'nlist': index.nlist, 'k': k,
+        'train_seconds': train_seconds, 'exact_latency_ms': exact_ms, 'results': results,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store', help="Directory of a saved NumpyVectorStore to benchmark instead of synthetic data")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--clusters', type=int, default=500)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nlist', type=int, default=None)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    if args.store:
+        matrix = np.load(f"{args.store}/{MATRIX_FILE}", mmap_mode='r')
+    else:
+        matrix = synthetic_corpus(args.rows, args.dim, args.clusters)
+    queries = sample_queries(matrix, min(args.queries, len(matrix)))
+    report = run(matrix, queries, args.k, args.nlist, args.nprobe)
+
+    print(f"rows={report['rows']} dim={report['dim']} nlist={report['nlist']} "
+          f"train={report['train_seconds']:.1f}s exact={report['exact_latency_ms']:.2f}ms/query")
+    print(f"{'nprobe':>7} {'recall@' + str(args.k):>10} {'ms/query':>9} {'scanned':>8}")
+    for row in report['results']:
+        print(f"{row['nprobe']:>7} {row[f'recall@{args.k}']:>10.3f} {row['latency_ms']:>9.2f} "
+              f"{row['scanned_fraction']:>8.1%}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
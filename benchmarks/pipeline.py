@@ -0,0 +1,224 @@
+"""Offline performance benchmark of the full evaluation pipeline.
+
+Uses the deterministic stand-ins in utils.fakes (simulated API latency, no network) to
+measure index build time, retrieval latency, per-stage latency, and end-to-end latency
+percentiles and throughput across corpus sizes and concurrency levels:
+
+    python -m benchmarks.pipeline --corpus-chunks 200 2000 --concurrency 1 4 16 --output bench.json
+    python -m benchmarks.pipeline --compare bench.json     # exit 1 on a regression
+
+Everything (corpus, vector store, result files) is written to a temporary directory.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.embedder import create_vector_store_from_sources
+from utils.embedding_pipeline import BatchedEmbeddings
+from utils.fakes import FakeChatModel, FakeEmbeddings
+
+CHUNKS_PER_FILE = 20
+def latency_summary(samples):
+    if not samples:
+        return None
+    values = np.asarray(samples) * 1000
+    return {
+        'count': len(values),
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+    }
+
+def build_corpus(directory, chunk_count, seed=0):
+    """Write topic-clustered synthetic text files totalling roughly chunk_count chunks"""
+    rng = random.Random(seed)
+    vocabulary = [f"term{index}" for index in range(max(200, chunk_count))]
+    os.makedirs(directory, exist_ok=True)
+    for file_index in range(max(1, chunk_count // CHUNKS_PER_FILE)):
+        topic = rng.sample(vocabulary, 12)
+        paragraphs = []
+        for _ in range(CHUNKS_PER_FILE):
+            sentences = []
+            while sum(len(sentence) + 1 for sentence in sentences) < 800:
+                words = rng.choices(topic, k=8) + rng.choices(vocabulary, k=4)
+                rng.shuffle(words)
+                sentences.append(" ".join(words).capitalize() + ".")
+            paragraphs.append(" ".join(sentences))
+        with open(os.path.join(directory, f"doc_{file_index:05d}.txt"), 'w', encoding='utf-8') as f:
+            f.write("\n\n".join(paragraphs))
+    return vocabulary
+
+def make_queries(vocabulary, count, seed=1):
+    rng = random.Random(seed)
+    return [f"What does the document say about {' and '.join(rng.sample(vocabulary, 2))}?" for _ in range(count)]
+
+def run_concurrency_level(evaluator, queries, level):
+    latencies = []
+    lock = threading.Lock()
+
+    def ask(index_and_query):
+        index, query = index_and_query
+        start = time.perf_counter()
+        evaluator.comprehensive_evaluate(query, session_id=f"bench-{level}-{index}")
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=level) as pool:
+        list(pool.map(ask, enumerate(queries)))
+    wall = time.perf_counter() - wall_start
+    return {'concurrency': level, 'throughput_qps': len(queries) / wall, 'latency': latency_summary(latencies)}
+
+def run_corpus(args, workdir, chunk_count):
+    from comprehensive_evaluation import ComprehensiveAgentEvaluator
+
+    corpus_dir = os.path.join(workdir, f"corpus_{chunk_count}")
+    vocabulary = build_corpus(corpus_dir, chunk_count)
+    sources = os.path.join(corpus_dir, "*.txt")
+    persist_directory = os.path.join(workdir, "vector_store")
+    embeddings = BatchedEmbeddings(
+        FakeEmbeddings(latency=args.embed_latency, per_text_latency=args.embed_per_text_latency),
+        requests_per_minute=None)
+
+    build_start = time.perf_counter()
+    retriever = create_vector_store_from_sources(sources, persist_directory=persist_directory,
+                                                 backend=args.backend, embeddings=embeddings)
+    index_build_seconds = time.perf_counter() - build_start
+    indexed_chunks = len(retriever.vectorstore.get(include=[])['ids'])
+
+    queries = make_queries(vocabulary, args.queries)
+    retrieval = []
+    for query in queries:
+        start = time.perf_counter()
+        retriever.invoke(query)
+        retrieval.append(time.perf_counter() - start)
+
+    llm = FakeChatModel(latency=args.llm_latency, token_latency=args.token_latency)
+    evaluator = ComprehensiveAgentEvaluator(
+        sources, parallel_judges=args.parallel, fused_judge=args.fused_judge, vector_backend=args.backend,
+        retrieval=args.retrieval, llm=llm, embeddings=embeddings, persist_directory=persist_directory,
+        request_concurrency=max(args.concurrency))
+    evaluator.show_progress = False
+
+    levels = [run_concurrency_level(evaluator, queries, level) for level in args.concurrency]
+    evaluator.write_final_report()
+    if evaluator._judge_pool is not None:
+        evaluator._judge_pool.shutdown()
+    return {
+        'corpus_chunks': chunk_count,
+        'indexed_chunks': indexed_chunks,
+        'index_build_seconds': index_build_seconds,
+        'retrieval': latency_summary(retrieval),
+        # Per-stage, judge, retriever and LLM latencies from the evaluator's tracing spans
+        'stages': evaluator.tracer.to_dict()['spans'],
+        'end_to_end': levels,
+    }
+
+def compare(baseline, current, tolerance):
+    """Print p95 / throughput deltas against a baseline run; return the regressions found"""
+    regressions = []
+    baseline_runs = {run['corpus_chunks']: run for run in baseline['runs']}
+    for run in current['runs']:
+        previous = baseline_runs.get(run['corpus_chunks'])
+        if previous is None:
+            continue
+        checks = [('index build s', previous['index_build_seconds'], run['index_build_seconds'], True),
+                  ('retrieval p95 ms', previous['retrieval']['p95_ms'], run['retrieval']['p95_ms'], True)]
+        previous_levels = {level['concurrency']: level for level in previous['end_to_end']}
+        for level in run['end_to_end']:
+            old = previous_levels.get(level['concurrency'])
+            if old is None:
+                continue
+            checks.append((f"c={level['concurrency']} p95 ms", old['latency']['p95_ms'], level['latency']['p95_ms'], True))
+            checks.append((f"c={level['concurrency']} qps", old['throughput_qps'], level['throughput_qps'], False))
+        for label, old_value, new_value, lower_is_better in checks:
+            change = (new_value - old_value) / old_value if old_value else 0.0
+            worse = change > tolerance if lower_is_better else change < -tolerance
+            print(f"  chunks={run['corpus_chunks']:<7} {label:<18} {old_value:>10.2f} -> {new_value:>10.2f} "
+                  f"({change:+.1%}){'  REGRESSION' if worse else ''}")
+            if worse:
+                regressions.append((run['corpus_chunks'], label, old_value, new_value))
+    return regressions
+
+def print_run(run):
+    print(f"\ncorpus {run['indexed_chunks']} chunks: index build {run['index_build_seconds']:.2f}s, "
+          f"retrieval p50/p95/p99 {run['retrieval']['p50_ms']:.1f}/{run['retrieval']['p95_ms']:.1f}/"
+          f"{run['retrieval']['p99_ms']:.1f} ms")
+    for stage, summary in run['stages'].items():
+        print(f"  {stage:<20} n={summary['count']:<5} mean {summary['mean_seconds'] * 1000:8.1f} ms  "
+              f"p95 {summary['p95_seconds'] * 1000:8.1f} ms")
+    for level in run['end_to_end']:
+        latency = level['latency']
+        print(f"  concurrency {level['concurrency']:<3} {level['throughput_qps']:7.2f} q/s  "
+              f"p50/p95/p99 {latency['p50_ms']:.0f}/{latency['p95_ms']:.0f}/{latency['p99_ms']:.0f} ms")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus-chunks', type=int, nargs='+', default=[200, 2000])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--queries', type=int, default=48, help="Questions per concurrency level")
+    parser.add_argument('--llm-latency', type=float, default=0.05, help="Simulated seconds per LLM call")
+    parser.add_argument('--token-latency', type=float, default=0.0, help="Simulated seconds per streamed token")
+    parser.add_argument('--embed-latency', type=float, default=0.02, help="Simulated seconds per embedding call")
+    parser.add_argument('--embed-per-text-latency', type=float, default=0.0002,
+                        help="Additional simulated seconds per embedded text")
+    parser.add_argument('--backend', choices=['chroma', 'numpy'], default='chroma')
+    parser.add_argument('--retrieval', choices=['vector', 'hybrid'], default='vector')
+    parser.add_argument('--parallel', action='store_true')
+    parser.add_argument('--fused-judge', action='store_true')
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--compare', metavar='BASELINE_JSON', help="Compare against an earlier --output file")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Relative slowdown tolerated before --compare reports a regression")
+    parser.add_argument('--keep-workdir', action='store_true')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Claim the root logger first so the evaluator's per-request INFO logging stays quiet
+    logging.basicConfig(level=logging.WARNING)
+
+    workdir = tempfile.mkdtemp(prefix="pipeline_bench_")
+    original_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        # Throwaway build so one-off client start-up is not charged to the first corpus
+        warm_up = argparse.Namespace(**{**vars(args), 'queries': 1, 'concurrency': [1]})
+        run_corpus(warm_up, os.path.join(workdir, "warm_up"), CHUNKS_PER_FILE)
+        runs = [run_corpus(args, workdir, chunk_count) for chunk_count in args.corpus_chunks]
+    finally:
+        os.chdir(original_cwd)
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'keep_workdir')},
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'runs': runs,
+    }
+    for run in runs:
+        print_run(run)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\nComparison with {args.compare} (tolerance {args.tolerance:.0%}):")
+        if compare(baseline, report, args.tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,92 @@
 import time
+_MODULE_IMPORT_START = time.perf_counter()
+import re
 import json
 import logging
+import os
+import argparse
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque
 from datetime import datetime
-from typing import Dict, List, Any
+from operator import itemgetter
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Callable
 from dotenv import load_dotenv
 load_dotenv()
 
-from utils.loader import load_and_split_document
-from utils.embedder import create_vector_store
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.memory import ConversationBufferMemory
+# LangChain, Chroma and the Google clients are imported on first use (utils.startup.timed_import),
+# so the prompt can appear before they finish loading
+from utils.loader import iter_chunks
+from utils.embedder import (create_vector_store_from_sources, compute_sources_key, embedding_identity,
+                            PERSIST_DIRECTORY)
+from utils.answer_cache import AnswerCache
+from utils.memory import BoundedConversationMemory
+from utils.event_log import EventLog, SessionAggregates
+from utils.pattern_matcher import PatternMatcher, HARMFUL_PATTERNS_PATH, INJECTION_PATTERNS_PATH
+from utils.eval_queue import EvaluationQueue
+from utils.startup import ComponentRegistry, IMPORT_TIMINGS, timed_import
+from utils.tracing import Tracer, traced
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.language_models.chat_models import BaseChatModel
+
+MODULE_IMPORT_SECONDS = time.perf_counter() - _MODULE_IMPORT_START
+
+ANSWER_PROMPT = """Answer the following question based only on the provided context:
+
+<context>
+{context}
+</context>
+
+Question: {input}"""
+
+# Judge calls one request can have in flight at once in parallel mode (ambiguity, stage 3, stage 4)
+JUDGES_PER_REQUEST = 3
+
+def parse_judge_verdict(text: str) -> Dict[str, Any]:
+    """Strictly parse the fused judge's JSON verdict; any invalid field comes back as None"""
+    verdict = {'hallucination': None, 'quality_score': None, 'rationale': None}
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    if not match:
+        return verdict
+    try:
+        payload = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return verdict
+    if not isinstance(payload, dict):
+        return verdict
+    
+    if isinstance(payload.get('hallucination'), bool):
+        verdict['hallucination'] = payload['hallucination']
+    score = payload.get('quality_score')
+    if isinstance(score, int) and not isinstance(score, bool) and 1 <= score <= 10:
+        verdict['quality_score'] = score
+    if isinstance(payload.get('rationale'), str):
+        verdict['rationale'] = payload['rationale']
+    return verdict
+
+def format_score(score: Optional[int]) -> str:
+    """Render a judge score, showing N/A when the judge gave no usable score"""
+    return 'N/A' if score is None else str(score)
 
 class ComprehensiveAgentEvaluator:
-    def __init__(self, doc_path: str):
+    def __init__(self, doc_path: str, parallel_judges: bool = False, fused_judge: bool = False,
+                 use_cache: bool = False, cache_similarity: Optional[float] = None,
+                 memory_token_budget: Optional[int] = 2000, summarize_memory: bool = False,
+                 retrieval: str = "vector", retrieval_k: int = 4, lexical_fast_path: bool = False,
+                 vector_backend: str = "chroma", ann_nprobe: Optional[int] = None,
+                 ann_nlist: Optional[int] = None, harmful_patterns: Optional[List[str]] = None,
+                 injection_patterns: Optional[List[str]] = None, ambiguity_gate: bool = False,
+                 llm: Optional["BaseChatModel"] = None, embeddings: Optional["Embeddings"] = None,
+                 persist_directory: str = PERSIST_DIRECTORY, warm_up: bool = False,
+                 context_tokens: Optional[int] = None, context_mmr: Optional[float] = None,
+                 eval_sample_rate: Optional[float] = None, eval_queue_size: int = 100,
+                 eval_queue_policy: str = 'drop', eval_workers: int = 1,
+                 llm_requests_per_minute: Optional[float] = None, llm_tokens_per_minute: Optional[float] = None,
+                 llm_max_retries: int = 3, request_concurrency: int = 1):
+        init_start = time.perf_counter()
         # Set up logging for audit trails
         logging.basicConfig(
             level=logging.INFO,
@@ -27,29 +98,65 @@ class ComprehensiveAgentEvaluator:
         )
         self.logger = logging.getLogger(__name__)
         
-        # Initialize result file for session reporting
+        # Initialize result file for session reporting; every interaction is also
+        # appended once to a JSONL event log and folded into running aggregates
         self.result_file = "result.txt"
+        self.events_file = "result_events.jsonl"
+        self.metrics_file = "result_metrics.prom"
         self.session_start_time = datetime.now()
+        self.session_id = self.session_start_time.strftime('%Y%m%dT%H%M%S')
         
-        # Initialize components
-        self.docs = load_and_split_document(doc_path)
-        self.retriever = create_vector_store(self.docs)
-        self.llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0)
+        # Spans around every stage, judge, retriever and LLM call feed latency histograms
+        self.tracer = Tracer()
+        self._tracing_callbacks = [self.tracer.callback_handler()]
         
-        # Set up QA chain
-        self.prompt = ChatPromptTemplate.from_template("""Answer the following question based only on the provided context:
-
-<context>
-{context}
-</context>
-
-Question: {input}""")
+        # Heavy components (index, LLM client, QA chain) are built lazily by name. Normally they
+        # are all built here; with warm_up they build on a background thread and the first
+        # query only waits for the ones it needs that are not ready yet.
+        # A directory or glob is ingested as a streamed multi-file corpus; setting ann_nprobe
+        # puts an IVF approximate index in front of the NumPy backend. llm and embeddings
+        # default to Gemini; pass stand-ins (utils.fakes) to run offline.
+        self.doc_path = doc_path
+        ann = {'nlist': ann_nlist, 'nprobe': ann_nprobe} if ann_nprobe else None
+        self._store_options = {'backend': vector_backend, 'ann': ann, 'embeddings': embeddings,
+                               'persist_directory': persist_directory}
+        self._retrieval_options = {'retrieval': retrieval, 'k': retrieval_k, 'lexical_fast_path': lexical_fast_path}
+        self._llm_override = llm
+        # Every LLM call (QA chain, judges, memory summaries) goes through one shared client
+        # that throttles to the quota, retries with backoff and coalesces identical prompts
+        self._llm_client_options = {'requests_per_minute': llm_requests_per_minute,
+                                    'tokens_per_minute': llm_tokens_per_minute,
+                                    'max_retries': llm_max_retries}
+        self._ambiguity_gate_enabled = ambiguity_gate
+        self._cache_options = {'enabled': use_cache, 'similarity': cache_similarity}
+        # Optional context packing between retriever and prompt: merge overlapping chunks,
+        # drop near-duplicates, optionally diversify (MMR) and trim to a token budget
+        self.context_packer = None
+        if context_tokens:
+            from utils.context_packer import ContextPacker
+            self.context_packer = ContextPacker(max_tokens=context_tokens, mmr_lambda=context_mmr)
+        self.components = ComponentRegistry()
+        self.components.register('index', self._build_index)
+        self.components.register('llm_client', self._build_llm_client)
+        self.components.register('llm', self._build_llm, depends=('llm_client',))
+        self.components.register('retriever', self._build_retriever, depends=('index',))
+        self.components.register('qa_chain', self._build_qa_chain, depends=('llm', 'retriever'))
+        self.components.register('ambiguity_gate', self._build_ambiguity_gate, depends=('retriever',))
+        self.components.register('answer_cache', self._build_answer_cache, depends=('index',))
+        self.warm_up = warm_up
         
-        document_chain = create_stuff_documents_chain(self.llm, self.prompt)
-        self.qa_chain = create_retrieval_chain(self.retriever, document_chain)
+        # Initialize memory for multi-turn evaluation; extra sessions (HTTP mode) get their own.
+        # Memory is a token-budgeted sliding window, optionally with a rolling LLM summary.
+        self.memory_token_budget = memory_token_budget
+        self.summarize_memory = summarize_memory
+        self.memory = self._new_memory()
+        self.sessions = OrderedDict()
+        self.max_sessions = 1000
+        self._sessions_lock = threading.Lock()
         
-        # Initialize memory for multi-turn evaluation
-        self.memory = ConversationBufferMemory()
+        # Stage 1 policy lists, each compiled once into a single whole-word matcher
+        self.harmful_matcher = PatternMatcher.from_files(harmful_patterns or [HARMFUL_PATTERNS_PATH])
+        self.injection_matcher = PatternMatcher.from_files(injection_patterns or [INJECTION_PATTERNS_PATH])
         
         # Evaluation metrics storage
         self.evaluation_metrics = {
@@ -57,15 +164,195 @@ Question: {input}""")
             'successful_responses': 0,
             'failed_responses': 0,
             'avg_response_time': 0,
+            'streamed_responses': 0,
+            'avg_time_to_first_token': 0,
             'hallucination_count': 0,
             'ambiguous_queries': 0,
-            'harmful_content_detected': 0
+            'harmful_content_detected': 0,
+            'cache_hits': 0,
+            'ambiguity_checks': 0,
+            'ambiguity_escalations': 0
         }
         
-        self.interaction_logs = []
+        # Only the most recent interactions stay in RAM; the full history is in the event log
+        self.interaction_logs = deque(maxlen=10)
+        self.aggregates = SessionAggregates()
+        self.event_log = EventLog(self.events_file)
+        
+        # Metrics and logs are shared by concurrent evaluations (batch mode)
+        self._metrics_lock = threading.RLock()
+        self.show_progress = True
+        
+        # Optional parallel mode: independent LLM judge calls overlap on a thread pool sized for
+        # every request (batch/serve concurrency) and deferred-evaluation worker at once, so the
+        # judges of concurrent requests never queue behind each other
+        self.parallel_judges = parallel_judges
+        self._judge_pool = None
+        if parallel_judges:
+            judging_threads = max(1, request_concurrency) + (eval_workers if eval_sample_rate is not None else 0)
+            self._judge_pool = ThreadPoolExecutor(max_workers=JUDGES_PER_REQUEST * judging_threads,
+                                                  thread_name_prefix="judge")
+        
+        # Optional fused mode: one structured LLM call judges both hallucination and quality
+        self.fused_judge = fused_judge
+        
+        # Optional deferred mode: the answer is returned right after generation and a sampled
+        # fraction of answers is judged (Stage 3/4) on background workers; the verdict is
+        # appended to the event log as a separate 'evaluation' event when it finishes
+        self.eval_queue = None
+        if eval_sample_rate is not None:
+            self.eval_queue = EvaluationQueue(self._complete_deferred_evaluation, sample_rate=eval_sample_rate,
+                                              max_size=eval_queue_size, policy=eval_queue_policy,
+                                              workers=eval_workers)
         
         # Initialize result file for this session
         self.initialize_result_file()
+        self.event_log.append({
+            'event': 'session_start',
+            'session': self.session_id,
+            'timestamp': self.session_start_time.isoformat(),
+            'document': doc_path
+        })
+        
+        if warm_up:
+            self.components.warm_up()
+        else:
+            self.components.build_all()
+        self.init_seconds = time.perf_counter() - init_start
+    
+    def _build_index(self) -> Dict[str, Any]:
+        """Stream the document(s) into the vector store; returns docs, index_key and vectorstore.
+
+        Files, directories and globs all go through the same batched ingestion path. The
+        in-memory chunk list is only kept for a single file, and only when hybrid retrieval
+        or the ambiguity gate will use it.
+        """
+        model = embedding_identity(self._store_options['embeddings'])
+        index_key = compute_sources_key(self.doc_path, model=model)
+        retriever = create_vector_store_from_sources(self.doc_path, **self._store_options)
+        docs = None
+        if os.path.isfile(self.doc_path) and (
+                self._retrieval_options['retrieval'] == "hybrid" or self._ambiguity_gate_enabled):
+            docs = list(iter_chunks(self.doc_path, workers=0))
+        return {'docs': docs, 'index_key': index_key, 'vectorstore': retriever.vectorstore}
+    
+    def _build_llm_client(self):
+        llm = self._llm_override
+        if llm is None:
+            google_genai = timed_import("langchain_google_genai")
+            # A single attempt (stop_after_attempt(1)): LLMClient is the only retry layer, so
+            # every retry and backoff wait shows up in its counters
+            llm = google_genai.ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0, max_retries=1)
+        from utils.llm_client import LLMClient
+        return LLMClient(model=llm, tracer=self.tracer, **self._llm_client_options)
+    
+    def _build_llm(self):
+        return self.components.get('llm_client').with_config(callbacks=self._tracing_callbacks)
+    
+    def _build_retriever(self):
+        options = self._retrieval_options
+        # Hybrid retrieval: local BM25 fused with vector search via reciprocal rank fusion
+        if options['retrieval'] == "hybrid":
+            from utils.hybrid_retriever import build_hybrid_retriever
+            return build_hybrid_retriever(
+                self.vectorstore, self.docs, k=options['k'], lexical_fast_path=options['lexical_fast_path'])
+        return self.vectorstore.as_retriever(search_kwargs={'k': options['k']})
+    
+    def _build_qa_chain(self):
+        chains = timed_import("langchain.chains")
+        combine_documents = timed_import("langchain.chains.combine_documents")
+        prompts = timed_import("langchain_core.prompts")
+        self.prompt = prompts.ChatPromptTemplate.from_template(ANSWER_PROMPT)
+        document_chain = combine_documents.create_stuff_documents_chain(self.llm, self.prompt)
+        retrieval = self.retriever
+        if self.context_packer is not None:
+            runnables = timed_import("langchain_core.runnables")
+            retrieval = runnables.RunnableParallel(
+                documents=itemgetter("input") | self.retriever,
+                query=itemgetter("input")
+            ) | runnables.RunnableLambda(self._pack_context)
+        return chains.create_retrieval_chain(retrieval, document_chain).with_config(
+            callbacks=self._tracing_callbacks)
+    
+    @traced("context_packing")
+    def _pack_context(self, inputs: Dict[str, Any]) -> List[Any]:
+        """Pack retrieved chunks for the prompt, counting chunks and tokens before and after"""
+        packed = self.context_packer.pack(inputs['documents'], inputs['query'])
+        for phase, documents in (('retrieved', inputs['documents']), ('packed', packed)):
+            measured = self.context_packer.measure(documents)
+            self.tracer.add("context_chunks_total", measured['chunks'], phase=phase)
+            self.tracer.add("context_tokens_total", measured['tokens'], phase=phase)
+        return packed
+    
+    def _build_ambiguity_gate(self):
+        """Optional local ambiguity gate; only questions it is unsure about reach the LLM judge"""
+        if not self._ambiguity_gate_enabled:
+            return None
+        from utils.ambiguity_gate import AmbiguityGate, document_vocabulary
+        if self.docs is not None:
+            vocabulary = document_vocabulary(self.docs)
+        elif self._retrieval_options['retrieval'] == "hybrid":
+            vocabulary = self.retriever.bm25.postings.keys()
+        else:
+            vocabulary = None  # avoid a full scan of a large corpus just for the vocabulary
+        return AmbiguityGate(vocabulary)
+    
+    def _build_answer_cache(self):
+        """Optional answer cache, invalidated whenever the document index changes"""
+        if not self._cache_options['enabled']:
+            return None
+        cache_similarity = self._cache_options['similarity']
+        embed_fn = None
+        if cache_similarity is not None:
+            embed_fn = self.vectorstore.embeddings.embed_query
+        return AnswerCache(
+            index_version=self.index_key,
+            embed_fn=embed_fn,
+            similarity_threshold=cache_similarity if cache_similarity is not None else 1.0
+        )
+    
+    # Lazily built components: each access blocks only until that component is ready
+    @property
+    def docs(self):
+        return self.components.get('index')['docs']
+    
+    @property
+    def index_key(self) -> str:
+        return self.components.get('index')['index_key']
+    
+    @property
+    def vectorstore(self):
+        return self.components.get('index')['vectorstore']
+    
+    @property
+    def retriever(self):
+        return self.components.get('retriever')
+    
+    @property
+    def llm(self):
+        return self.components.get('llm')
+    
+    @property
+    def qa_chain(self):
+        return self.components.get('qa_chain')
+    
+    @property
+    def ambiguity_gate(self):
+        return self.components.get('ambiguity_gate')
+    
+    @property
+    def answer_cache(self):
+        return self.components.get('answer_cache')
+    
+    def startup_report(self) -> Dict[str, Any]:
+        """Import and initialization timings in seconds (components still building are None)"""
+        return {
+            'module_import_seconds': MODULE_IMPORT_SECONDS,
+            'deferred_imports': dict(IMPORT_TIMINGS),
+            'init_seconds': self.init_seconds,
+            'warm_up': self.warm_up,
+            'components': self.components.timings(),
+        }
     
     def initialize_result_file(self):
         """Initialize the result file at the start of session"""
@@ -82,48 +369,127 @@ Question: {input}""")
         except Exception as e:
             self.logger.error(f"Failed to initialize result file: {e}")
     
-    def stage1_input_processing(self, user_input: str) -> Dict[str, Any]:
-        """Stage 1: Input Processing & Initial Checks"""
+    @traced("judge.ambiguity")
+    def _judge_ambiguity(self, user_input: str) -> bool:
+        """LLM-as-judge ambiguity verdict for stage 1"""
+        try:
+            ambiguity_prompt = f"Is this question ambiguous or unclear? Answer with 'Yes' or 'No': '{user_input}'"
+            ambiguity_response = self.llm.invoke(ambiguity_prompt)
+            return 'yes' in ambiguity_response.content.lower()
+        except Exception as e:
+            self.logger.error(f"Ambiguity detection failed: {e}")
+            # Don't stop processing, just continue
+            return False
+    
+    def _gate_ambiguity(self, user_input: str) -> Optional[bool]:
+        """Local ambiguity verdict, or None when the LLM judge has to decide"""
+        gate = self.ambiguity_gate if self._ambiguity_gate_enabled else None
+        verdict, reason = (None, "no gate") if gate is None else gate.classify(user_input)
+        with self._metrics_lock:
+            self.evaluation_metrics['ambiguity_checks'] += 1
+            if verdict is None:
+                self.evaluation_metrics['ambiguity_escalations'] += 1
+        if gate is not None:
+            self.logger.info(f"Ambiguity gate: {'escalated' if verdict is None else verdict} ({reason})")
+        return verdict
+    
+    def _check_ambiguity(self, user_input: str) -> bool:
+        verdict = self._gate_ambiguity(user_input)
+        return self._judge_ambiguity(user_input) if verdict is None else verdict
+    
+    def _record_ambiguity(self, evaluation_result: Dict[str, Any], user_input: str, is_ambiguous: bool):
+        """Apply an ambiguity verdict to a stage 1 result"""
+        if is_ambiguous:
+            evaluation_result['ambiguous'] = True
+            with self._metrics_lock:
+                self.evaluation_metrics['ambiguous_queries'] += 1
+            self.logger.warning(f"Ambiguous query detected: {user_input}")
+    
+    @traced("stage1")
+    def stage1_input_processing(self, user_input: str, check_ambiguity: bool = True) -> Dict[str, Any]:
+        """Stage 1: Input Processing & Initial Checks
+        
+        With check_ambiguity=False the ambiguity check is skipped so the caller
+        can run it concurrently and apply it later with _record_ambiguity.
+        """
         self.logger.info(f"Stage 1: Processing user input: {user_input}")
         
         evaluation_result = {
             'input_logged': True,
             'harmful_content': False,
+            'harmful_rule': None,
             'ambiguous': False,
-            'prompt_injection': False
+            'prompt_injection': False,
+            'injection_rule': None
         }
         
         # 1. Input Logging (✅ Implemented)
         self.logger.info(f"Raw user input logged: {user_input}")
         
-        # 2. Harmful Content Detection (Basic implementation)
-        harmful_keywords = ['hack', 'kill', 'bomb', 'violence', 'illegal']
-        if any(keyword in user_input.lower() for keyword in harmful_keywords):
+        # 2. Harmful Content Detection (policy pattern set)
+        harmful_match = self.harmful_matcher.search(user_input)
+        if harmful_match:
             evaluation_result['harmful_content'] = True
-            self.evaluation_metrics['harmful_content_detected'] += 1
-            self.logger.warning(f"Harmful content detected in input: {user_input}")
+            evaluation_result['harmful_rule'] = harmful_match[0]
+            with self._metrics_lock:
+                self.evaluation_metrics['harmful_content_detected'] += 1
+            self.logger.warning(f"Harmful content detected in input (rule {harmful_match[0]!r}): {user_input}")
         
         # 3. Ambiguity Detection using LLM as Judge
-        try:
-            ambiguity_prompt = f"Is this question ambiguous or unclear? Answer with 'Yes' or 'No': '{user_input}'"
-            ambiguity_response = self.llm.invoke(ambiguity_prompt)
-            if 'yes' in ambiguity_response.content.lower():
-                evaluation_result['ambiguous'] = True
-                self.evaluation_metrics['ambiguous_queries'] += 1
-                self.logger.warning(f"Ambiguous query detected: {user_input}")
-        except Exception as e:
-            self.logger.error(f"Ambiguity detection failed: {e}")
-            # Don't stop processing, just continue
+        if check_ambiguity:
+            self._record_ambiguity(evaluation_result, user_input, self._check_ambiguity(user_input))
         
-        # 4. Basic Prompt Injection Detection
-        injection_patterns = ['ignore previous', 'forget instructions', 'act as', 'pretend you are']
-        if any(pattern in user_input.lower() for pattern in injection_patterns):
+        # 4. Prompt Injection Detection (policy pattern set)
+        injection_match = self.injection_matcher.search(user_input)
+        if injection_match:
             evaluation_result['prompt_injection'] = True
-            self.logger.warning(f"Potential prompt injection detected: {user_input}")
+            evaluation_result['injection_rule'] = injection_match[0]
+            self.logger.warning(f"Potential prompt injection detected (rule {injection_match[0]!r}): {user_input}")
         
         return evaluation_result
     
-    def stage2_core_execution(self, user_input: str) -> Dict[str, Any]:
+    def _new_memory(self) -> BoundedConversationMemory:
+        summarize_fn = self._summarize_memory if self.summarize_memory else None
+        return BoundedConversationMemory(max_tokens=self.memory_token_budget, summarize_fn=summarize_fn)
+    
+    @traced("memory.summarize")
+    def _summarize_memory(self, summary: str, evicted_turns: List) -> str:
+        """Fold turns that left the memory window into the rolling summary"""
+        new_lines = "\n".join(f"{role}: {text}" for role, text in evicted_turns)
+        summary_prompt = f"""
+        Progressively summarize the conversation, adding the new lines to the current summary.
+        Keep it brief and keep facts the user may refer back to.
+        
+        Current summary: {summary or '(none)'}
+        New lines:
+        {new_lines}
+        
+        New summary:
+        """
+        try:
+            return self.llm.invoke(summary_prompt).content.strip()
+        except Exception as e:
+            self.logger.error(f"Memory summarization failed: {e}")
+            return summary
+    
+    def get_session_memory(self, session_id: Optional[str] = None) -> BoundedConversationMemory:
+        """Return the conversation memory for a session, creating it on first use"""
+        if session_id is None:
+            return self.memory
+        with self._sessions_lock:
+            memory = self.sessions.get(session_id)
+            if memory is None:
+                memory = self._new_memory()
+                self.sessions[session_id] = memory
+                # Forget the least recently used session once the cap is reached
+                if len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+            else:
+                self.sessions.move_to_end(session_id)
+            return memory
+    
+    @traced("stage2")
+    def stage2_core_execution(self, user_input: str, session_id: Optional[str] = None) -> Dict[str, Any]:
         """Stage 2: Core Agent Execution"""
         self.logger.info("Stage 2: Core agent execution monitoring")
         
@@ -146,26 +512,19 @@ Question: {input}""")
         })
         
         # 3. Memory Management Assessment
-        self.memory.chat_memory.add_user_message(user_input)
-        execution_log['memory_context'] = str(self.memory.buffer)
+        memory = self.get_session_memory(session_id)
+        memory.add_user_message(user_input)
+        # Log a digest of the memory state rather than a copy of the whole history
+        execution_log['memory_context'] = memory.digest()
         
         execution_log['action_sequence'].append("reasoning_started")
         execution_log['action_sequence'].append("response_generation")
         
         return execution_log
     
-    def stage3_output_generation(self, user_input: str, agent_response: str, response_time: float) -> Dict[str, Any]:
-        """Stage 3: Output Generation Evaluation"""
-        self.logger.info("Stage 3: Output generation evaluation")
-        
-        output_evaluation = {
-            'hallucination_detected': False,
-            'response_time_ms': response_time * 1000,
-            'edge_case_handling': True,
-            'fact_check_result': None
-        }
-        
-        # 1. Hallucination Detection (Basic implementation using LLM as Judge)
+    @traced("judge.hallucination")
+    def _judge_hallucination(self, user_input: str, agent_response: str) -> bool:
+        """LLM-as-judge hallucination verdict for stage 3"""
         try:
             hallucination_prompt = f"""
             Based on the context provided and the question asked, does this response contain any hallucinated or fabricated information?
@@ -177,16 +536,89 @@ Question: {input}""")
             """
             
             hallucination_check = self.llm.invoke(hallucination_prompt)
-            if 'yes' in hallucination_check.content.lower():
-                output_evaluation['hallucination_detected'] = True
-                self.evaluation_metrics['hallucination_count'] += 1
-                self.logger.warning(f"Hallucination detected in response: {agent_response[:100]}...")
+            return 'yes' in hallucination_check.content.lower()
         except Exception as e:
             self.logger.error(f"Hallucination detection failed: {e}")
             # Continue processing even if hallucination check fails
+            return False
+    
+    @traced("judge.quality")
+    def _judge_quality(self, user_input: str, agent_response: str) -> Optional[int]:
+        """LLM-as-judge 1-10 quality score for stage 4; None when no score could be obtained"""
+        try:
+            completion_prompt = f"""
+            Rate how well this response answers the user's question on a scale of 1-10:
+            
+            Question: {user_input}
+            Response: {agent_response}
+            
+            Provide only a number from 1-10.
+            """
+            
+            quality_response = self.llm.invoke(completion_prompt)
+            # Extract number from response
+            score_match = re.search(r'\b([1-9]|10)\b', quality_response.content)
+            if score_match:
+                return int(score_match.group(1))
+            self.logger.warning(f"Could not parse quality score from judge output: {quality_response.content[:100]}")
+        except Exception as e:
+            self.logger.error(f"Quality assessment failed: {e}")
+        return None
+    
+    @traced("judge.fused")
+    def _fused_judge(self, user_input: str, agent_response: str) -> Dict[str, Any]:
+        """Single LLM call returning a structured hallucination + quality verdict"""
+        fused_prompt = f"""
+        You are evaluating an answer produced by a document question-answering assistant.
+        
+        Question: {user_input}
+        Response: {agent_response}
+        
+        Reply with only a JSON object of this exact form:
+        {{"hallucination": true or false, "quality_score": integer from 1 to 10, "rationale": "one short sentence"}}
+        
+        "hallucination" is true if the response contains fabricated or unverifiable information.
+        "quality_score" rates how well the response answers the question.
+        """
+        try:
+            verdict = parse_judge_verdict(self.llm.invoke(fused_prompt).content)
+        except Exception as e:
+            self.logger.error(f"Fused judge failed: {e}")
+            verdict = parse_judge_verdict("")
+        
+        missing = [field for field in ('hallucination', 'quality_score') if verdict[field] is None]
+        if missing:
+            self.logger.warning(f"Fused judge returned no valid {', '.join(missing)}; falling back to separate judge")
+        return verdict
+    
+    @traced("stage3")
+    def stage3_output_generation(self, user_input: str, agent_response: str, generation_time: float,
+                                 hallucination_verdict: Optional[bool] = None) -> Dict[str, Any]:
+        """Stage 3: Output Generation Evaluation
+        
+        A verdict already produced by the fused judge can be passed in; otherwise
+        the hallucination judge is called here.
+        """
+        self.logger.info("Stage 3: Output generation evaluation")
+        
+        output_evaluation = {
+            'hallucination_detected': False,
+            'generation_time_ms': generation_time * 1000,
+            'edge_case_handling': True,
+            'fact_check_result': None
+        }
+        
+        # 1. Hallucination Detection (Basic implementation using LLM as Judge)
+        if hallucination_verdict is None:
+            hallucination_verdict = self._judge_hallucination(user_input, agent_response)
+        if hallucination_verdict:
+            output_evaluation['hallucination_detected'] = True
+            with self._metrics_lock:
+                self.evaluation_metrics['hallucination_count'] += 1
+            self.logger.warning(f"Hallucination detected in response: {agent_response[:100]}...")
         
-        # 2. Latency Measurement
-        self.logger.info(f"Response generated in {response_time:.2f} seconds")
+        # 2. Latency Measurement (answer generation only; end-to-end time is recorded per interaction)
+        self.logger.info(f"Response generated in {generation_time:.2f} seconds")
         
         # 3. Edge Case Detection
         if len(user_input.strip()) == 0 or len(agent_response.strip()) == 0:
@@ -195,49 +627,38 @@ Question: {input}""")
         
         return output_evaluation
     
-    def stage4_final_validation(self, user_input: str, agent_response: str, overall_metrics: Dict) -> Dict[str, Any]:
-        """Stage 4: Final Output Validation"""
+    @traced("stage4")
+    def stage4_final_validation(self, user_input: str, agent_response: str, overall_metrics: Dict,
+                                quality_score: Optional[int] = None) -> Dict[str, Any]:
+        """Stage 4: Final Output Validation
+        
+        A score already produced by the fused judge can be passed in; otherwise
+        the quality judge is called here. An unavailable score is recorded as None
+        rather than a made-up default.
+        """
         self.logger.info("Stage 4: Final output validation")
         
         validation_result = {
             'task_completed': True,
-            'response_quality_score': 0,
+            'response_quality_score': None,
             'format_valid': True,
             'efficiency_score': 0
         }
         
         # 1. Task Completion Assessment using LLM as Judge
-        try:
-            completion_prompt = f"""
-            Rate how well this response answers the user's question on a scale of 1-10:
-            
-            Question: {user_input}
-            Response: {agent_response}
-            
-            Provide only a number from 1-10.
-            """
-            
-            quality_response = self.llm.invoke(completion_prompt)
-            # Extract number from response
-            import re
-            score_match = re.search(r'\b([1-9]|10)\b', quality_response.content)
-            if score_match:
-                validation_result['response_quality_score'] = int(score_match.group(1))
-            else:
-                validation_result['response_quality_score'] = 7  # Default score if parsing fails
-        except Exception as e:
-            self.logger.error(f"Quality assessment failed: {e}")
-            validation_result['response_quality_score'] = 7  # Default score
+        if quality_score is None:
+            quality_score = self._judge_quality(user_input, agent_response)
+        validation_result['response_quality_score'] = quality_score
         
         # 2. Format Validation
         if len(agent_response.strip()) < 10:
             validation_result['format_valid'] = False
             self.logger.warning("Response too short, format validation failed")
         
-        # 3. Efficiency Calculation
-        if overall_metrics['response_time_ms'] < 3000:  # Less than 3 seconds
+        # 3. Efficiency Calculation (on generation latency, which judge calls do not inflate)
+        if overall_metrics['generation_time_ms'] < 3000:  # Less than 3 seconds
             validation_result['efficiency_score'] = 10
-        elif overall_metrics['response_time_ms'] < 5000:  # Less than 5 seconds
+        elif overall_metrics['generation_time_ms'] < 5000:  # Less than 5 seconds
             validation_result['efficiency_score'] = 7
         else:
             validation_result['efficiency_score'] = 5
@@ -245,7 +666,123 @@ Question: {input}""")
         return validation_result
     
     def write_result_to_file(self, interaction_data: Dict[str, Any]):
-        """Write interaction result to result.txt file (overwrite mode)"""
+        """Append one interaction event to the JSONL event log and update the running aggregates"""
+        event = dict(interaction_data, event='interaction', session=self.session_id)
+        event.setdefault('status', 'ok')
+        try:
+            self.aggregates.update(event)
+            self.event_log.append(event)
+        except Exception as e:
+            self.logger.error(f"Failed to write interaction event: {e}")
+    
+    def _write_report_body(self, f, metrics: Dict[str, Any], recent: List[Dict[str, Any]]):
+        """Render the report sections from running aggregates; no interaction history is rescanned"""
+        aggregates = self.aggregates.to_dict()
+        
+        # Session Metrics
+        f.write("COMPREHENSIVE SESSION METRICS:\n")
+        f.write("-" * 40 + "\n")
+        f.write(f"Total Queries Processed: {metrics['total_queries']}\n")
+        f.write(f"Successful Responses: {metrics['successful_responses']}\n")
+        f.write(f"Failed Responses: {metrics['failed_responses']}\n")
+        success_rate = (metrics['successful_responses'] / max(1, metrics['total_queries'])) * 100
+        f.write(f"Success Rate: {success_rate:.2f}%\n")
+        f.write(f"Average Response Time: {metrics['avg_response_time']:.2f} seconds\n")
+        if metrics['streamed_responses']:
+            f.write(f"Average Time to First Token: {metrics['avg_time_to_first_token']:.2f} seconds\n")
+        f.write(f"Hallucinations Detected: {metrics['hallucination_count']}\n")
+        f.write(f"Ambiguous Queries: {metrics['ambiguous_queries']}\n")
+        if self._ambiguity_gate_enabled and metrics['ambiguity_checks']:
+            escalation_rate = metrics['ambiguity_escalations'] / metrics['ambiguity_checks'] * 100
+            f.write(f"Ambiguity Checks Escalated to LLM: {escalation_rate:.1f}%\n")
+        f.write(f"Harmful Content Blocked: {metrics['harmful_content_detected']}\n")
+        if self.components.is_ready('llm_client'):
+            client_stats = self.components.get('llm_client').stats
+            throttled = client_stats['throttle_seconds_requests'] + client_stats['throttle_seconds_tokens']
+            f.write(f"LLM Calls: {client_stats['calls']} ({client_stats['retries']} retries, "
+                    f"{client_stats['failures']} failed, {client_stats['coalesced']} coalesced, "
+                    f"{throttled:.1f}s throttled)\n")
+        if self.eval_queue is not None:
+            queue_stats = self.eval_queue.to_dict()
+            f.write(f"Deferred Evaluations: {queue_stats['completed']} completed, {queue_stats['depth']} queued, "
+                    f"{queue_stats['sampled_out']} not sampled, {queue_stats['dropped']} dropped, "
+                    f"{queue_stats['failed']} failed (sample rate {queue_stats['sample_rate']:.0%})\n")
+        f.write("\n")
+        
+        # Stage-wise Performance Analysis
+        f.write("STAGE-WISE PERFORMANCE ANALYSIS:\n")
+        f.write("-" * 40 + "\n")
+        pass_rates = aggregates['stage_pass_rates']
+        if aggregates['evaluated'] > 0:
+            f.write(f"Stage 1 (Input Safety): {pass_rates['stage1']:.1f}% pass rate\n")
+            f.write(f"Stage 2 (Core Execution): {pass_rates['stage2']:.1f}% success rate\n")
+            f.write(f"Stage 3 (Output Quality): {pass_rates['stage3']:.1f}% quality rate\n")
+            f.write(f"Stage 4 (Final Validation): {pass_rates['stage4']:.1f}% validation rate\n\n")
+        else:
+            f.write("No successful interactions to analyze.\n\n")
+        
+        # Quality Score Distribution
+        quality = aggregates['quality_score']
+        if quality['count']:
+            f.write("QUALITY SCORE DISTRIBUTION:\n")
+            f.write("-" * 30 + "\n")
+            f.write(f"Average Quality Score: {quality['mean']:.2f}/10\n")
+            f.write(f"Highest Score: {quality['max']}/10\n")
+            f.write(f"Lowest Score: {quality['min']}/10\n\n")
+        
+        response_time = aggregates['response_time']
+        if response_time['count']:
+            f.write("RESPONSE TIME DISTRIBUTION:\n")
+            f.write("-" * 30 + "\n")
+            f.write(f"Fastest Response: {response_time['min']:.2f}s\n")
+            f.write(f"Slowest Response: {response_time['max']:.2f}s\n\n")
+        
+        # Where the time goes: spans around stages, judges, retriever and LLM calls
+        spans = self.tracer.to_dict()['spans']
+        if spans:
+            f.write("LATENCY BREAKDOWN (per span):\n")
+            f.write("-" * 30 + "\n")
+            for name, span in spans.items():
+                f.write(f"{name:<20} calls: {span['count']:<6} mean: {span['mean_seconds']:.3f}s  "
+                        f"p95: {span['p95_seconds']:.3f}s  total: {span['sum_seconds']:.2f}s\n")
+            context_tokens = self.tracer.to_dict()['counters'].get('context_tokens_total')
+            if context_tokens:
+                f.write(f"Context packing: {context_tokens.get('phase=retrieved', 0):.0f} retrieved tokens "
+                        f"-> {context_tokens.get('phase=packed', 0):.0f} prompt tokens\n")
+            f.write("\n")
+        
+        # Recent Interactions
+        f.write("RECENT INTERACTIONS:\n")
+        f.write("-" * 30 + "\n")
+        for i, log in enumerate(recent, 1):
+            f.write(f"\nInteraction #{i}:\n")
+            f.write(f"Time: {log['timestamp']}\n")
+            f.write(f"Question: {log['user_input'][:100]}{'...' if len(log['user_input']) > 100 else ''}\n")
+            f.write(f"Response Time: {log['response_time']:.2f}s\n")
+            if log.get('time_to_first_token') is not None:
+                f.write(f"Time to First Token: {log['time_to_first_token']:.2f}s\n")
+            if log.get('generation_time') is not None:
+                f.write(f"Generation Time: {log['generation_time']:.2f}s\n")
+            if log.get('evaluation') and log['evaluation'] != 'completed':
+                f.write(f"Evaluation: {log['evaluation']}\n")
+            
+            if 'evaluation_summary' in log:
+                eval_summary = log['evaluation_summary']
+                f.write(f"Quality Score: {format_score(log.get('overall_score'))}/10\n")
+                f.write("Stage Results: ")
+                f.write(f"S1:{'✓' if not eval_summary['stage1']['harmful_content'] else '✗'} ")
+                f.write(f"S2:{'✓' if eval_summary['stage2']['execution_successful'] else '✗'} ")
+                f.write(f"S3:{'✓' if not eval_summary['stage3']['hallucination_detected'] else '✗'} ")
+                f.write(f"S4:{'✓' if eval_summary['stage4']['format_valid'] else '✗'}\n")
+            f.write("-" * 50 + "\n")
+        f.write(f"\nFull interaction log: {self.events_file} (session {self.session_id})\n")
+    
+    def write_report(self):
+        """Write the current session report to result.txt on demand"""
+        with self._metrics_lock:
+            metrics = dict(self.evaluation_metrics)
+            recent = list(self.interaction_logs)
+        self.event_log.flush()
         try:
             with open(self.result_file, 'w', encoding='utf-8') as f:
                 f.write("=" * 80 + "\n")
@@ -254,124 +791,373 @@ Question: {input}""")
                 f.write(f"Session Start: {self.session_start_time.strftime('%Y-%m-%d %H:%M:%S')}\n")
                 f.write(f"Last Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
                 f.write("-" * 80 + "\n\n")
-                
-                # Overall Session Metrics
-                f.write("OVERALL SESSION METRICS:\n")
-                f.write("-" * 30 + "\n")
-                f.write(f"Total Queries Processed: {self.evaluation_metrics['total_queries']}\n")
-                f.write(f"Successful Responses: {self.evaluation_metrics['successful_responses']}\n")
-                f.write(f"Failed Responses: {self.evaluation_metrics['failed_responses']}\n")
-                success_rate = (self.evaluation_metrics['successful_responses'] / max(1, self.evaluation_metrics['total_queries'])) * 100
-                f.write(f"Success Rate: {success_rate:.2f}%\n")
-                f.write(f"Average Response Time: {self.evaluation_metrics['avg_response_time']:.2f} seconds\n")
-                f.write(f"Hallucinations Detected: {self.evaluation_metrics['hallucination_count']}\n")
-                f.write(f"Ambiguous Queries: {self.evaluation_metrics['ambiguous_queries']}\n")
-                f.write(f"Harmful Content Blocked: {self.evaluation_metrics['harmful_content_detected']}\n\n")
-                
-                # Recent Interactions
-                f.write("RECENT INTERACTIONS:\n")
-                f.write("-" * 30 + "\n")
-                for i, log in enumerate(self.interaction_logs[-5:], 1):  # Last 5 interactions
-                    f.write(f"\nInteraction #{i}:\n")
-                    f.write(f"Time: {log['timestamp']}\n")
-                    f.write(f"Question: {log['user_input']}\n")
-                    f.write(f"Response Time: {log['response_time']:.2f}s\n")
-                    
-                    if 'evaluation_summary' in log:
-                        eval_summary = log['evaluation_summary']
-                        f.write(f"Quality Score: {log.get('overall_score', 'N/A')}/10\n")
-                        f.write("Stage Results:\n")
-                        f.write(f"  Stage 1 (Input Safety): {'PASS' if not eval_summary['stage1']['harmful_content'] else 'BLOCKED'}\n")
-                        f.write(f"  Stage 2 (Execution): {'SUCCESS' if eval_summary['stage2']['execution_successful'] else 'FAILED'}\n")
-                        f.write(f"  Stage 3 (Output Quality): {'GOOD' if not eval_summary['stage3']['hallucination_detected'] else 'HALLUCINATION DETECTED'}\n")
-                        f.write(f"  Stage 4 (Validation): {'VALID' if eval_summary['stage4']['format_valid'] else 'INVALID FORMAT'}\n")
-                    f.write("-" * 40 + "\n")
-                
+                self._write_report_body(f, metrics, recent)
                 f.write(f"\nReport generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
                 f.write("=" * 80 + "\n")
-                
         except Exception as e:
             self.logger.error(f"Failed to write result file: {e}")
+        self.write_metrics()
     
-    def comprehensive_evaluate(self, user_input: str) -> Dict[str, Any]:
-        """Run comprehensive evaluation through all 4 stages"""
-        start_time = time.time()
-        
-        # Stage 1: Input Processing
-        print("   🔍 Stage 1: Input Processing & Safety Checks...")
-        stage1_result = self.stage1_input_processing(user_input)
-        
-        # If harmful content detected, stop processing
-        if stage1_result['harmful_content']:
-            return {
-                'error': 'Harmful content detected',
-                'stage1_result': stage1_result,
-                'blocked': True
-            }
-        
+    def write_metrics(self):
+        """Export the span histograms and counters in Prometheus text format"""
         try:
-            # Stage 2: Core Execution
-            print("   ⚙️  Stage 2: Core Agent Execution...")
-            stage2_result = self.stage2_core_execution(user_input)
-            
-            # Generate response
-            print("   📝 Generating response...")
-            response = self.qa_chain.invoke({"input": user_input})
-            agent_response = response["answer"]
-            
-            response_time = time.time() - start_time
-            
-            # Stage 3: Output Generation
-            print("   📝 Stage 3: Output Generation Evaluation...")
-            stage3_result = self.stage3_output_generation(user_input, agent_response, response_time)
-            
-            # Stage 4: Final Validation
-            print("   ✅ Stage 4: Final Validation...")
-            stage4_result = self.stage4_final_validation(user_input, agent_response, stage3_result)
-            
+            with open(self.metrics_file, 'w', encoding='utf-8') as f:
+                f.write(self.tracer.to_prometheus())
+        except Exception as e:
+            self.logger.error(f"Failed to write metrics file: {e}")
+    
+    def _record_interaction(self, user_input: str, agent_response: str, response_time: float,
+                            stage1_result: Dict[str, Any], stage2_result: Dict[str, Any],
+                            stage3_result: Optional[Dict[str, Any]], stage4_result: Optional[Dict[str, Any]],
+                            cache_hit: bool = False, timings: Optional[Dict[str, Any]] = None,
+                            session_id: Optional[str] = None, interaction_id: Optional[str] = None,
+                            evaluation: Optional[str] = None) -> Dict[str, Any]:
+        """Update session metrics, log the interaction and build the evaluation result.
+        
+        With a deferred ``evaluation`` status, stage3_result and stage4_result are None and
+        the interaction is logged without an evaluation summary until its judges finish.
+        """
+        with self._metrics_lock:
             # Update metrics
             self.evaluation_metrics['total_queries'] += 1
             self.evaluation_metrics['successful_responses'] += 1
+            if cache_hit:
+                self.evaluation_metrics['cache_hits'] += 1
             
             # Calculate running average response time
             total_time = self.evaluation_metrics['avg_response_time'] * (self.evaluation_metrics['total_queries'] - 1)
             self.evaluation_metrics['avg_response_time'] = (total_time + response_time) / self.evaluation_metrics['total_queries']
             
+            # Time to first token is only meaningful for streamed answers
+            timings = timings or {}
+            time_to_first_token = timings.get('time_to_first_token')
+            if time_to_first_token is not None:
+                self.evaluation_metrics['streamed_responses'] += 1
+                streamed = self.evaluation_metrics['streamed_responses']
+                total_ttft = self.evaluation_metrics['avg_time_to_first_token'] * (streamed - 1)
+                self.evaluation_metrics['avg_time_to_first_token'] = (total_ttft + time_to_first_token) / streamed
+            
+            evaluation_summary = {
+                'stage1': stage1_result,
+                'stage2': stage2_result
+            }
+            overall_score = None
+            if evaluation is None:
+                evaluation_summary.update(stage3=stage3_result, stage4=stage4_result)
+                overall_score = stage4_result['response_quality_score']
+            
             # Store interaction log
             interaction_log = {
                 'timestamp': datetime.now().isoformat(),
+                'session_id': session_id,
                 'user_input': user_input,
                 'agent_response': agent_response,
                 'response_time': response_time,
-                'evaluation_summary': {
-                    'stage1': stage1_result,
-                    'stage2': stage2_result,
-                    'stage3': stage3_result,
-                    'stage4': stage4_result
-                },
-                'overall_score': stage4_result['response_quality_score']
+                'time_to_first_token': time_to_first_token,
+                'generation_time': timings.get('generation_time'),
+                'overall_score': overall_score,
+                'cache_hit': cache_hit
             }
+            if evaluation is None:
+                interaction_log['evaluation_summary'] = evaluation_summary
+            else:
+                # Stage 3/4 arrive later as an 'evaluation' event with the same interaction_id
+                interaction_log.update(interaction_id=interaction_id, evaluation=evaluation)
             
             self.interaction_logs.append(interaction_log)
             
-            # Write results to file after each interaction
+            # Append the interaction to the event log (result.txt is rendered on demand)
             self.write_result_to_file(interaction_log)
             
             return {
                 'agent_response': agent_response,
-                'evaluation_summary': {
-                    'stage1': stage1_result,
-                    'stage2': stage2_result,
+                'evaluation_summary': evaluation_summary,
+                'response_time': response_time,
+                'time_to_first_token': time_to_first_token,
+                'generation_time': timings.get('generation_time'),
+                'overall_score': overall_score,
+                'cache_hit': cache_hit
+            }
+    
+    def _progress(self, message: str):
+        """Print a pipeline progress line unless progress output is switched off"""
+        if self.show_progress:
+            print(message)
+    
+    def _serve_cached_answer(self, user_input: str, stage1_result: Dict[str, Any],
+                             cached: Dict[str, Any], start_time: float,
+                             session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Answer from the cache, reusing the stored Stage 3/4 evaluation"""
+        self._progress("   ♻️  Cache hit: reusing stored answer and evaluation...")
+        self.logger.info(f"Answer cache hit for: {user_input}")
+        
+        self._record_ambiguity(stage1_result, user_input, cached['ambiguous'])
+        stage2_result = self.stage2_core_execution(user_input, session_id)
+        stage2_result['tools_called'].append({
+            'tool': 'answer_cache',
+            'parameters': {'query': user_input},
+            'timestamp': datetime.now().isoformat()
+        })
+        response_time = time.time() - start_time
+        stage3_result = dict(cached['stage3'])
+        
+        return self._record_interaction(user_input, cached['agent_response'], response_time,
+                                        stage1_result, stage2_result, stage3_result, dict(cached['stage4']),
+                                        cache_hit=True, session_id=session_id)
+    
+    @traced("generation")
+    def _generate_answer(self, user_input: str, start_time: float,
+                         on_token: Optional[Callable[[str], None]] = None):
+        """Run the QA chain, streaming answer tokens to on_token when given.
+        
+        Returns the answer and its timings; time to first token is measured from
+        the start of the request, since that is the wait the user perceives.
+        """
+        generation_start = time.time()
+        if on_token is None:
+            response = self.qa_chain.invoke({"input": user_input})
+            return response["answer"], {
+                'time_to_first_token': None,
+                'generation_time': time.time() - generation_start
+            }
+        
+        answer_parts = []
+        time_to_first_token = None
+        for chunk in self.qa_chain.stream({"input": user_input}):
+            token = chunk.get("answer")
+            if not token:
+                continue
+            if time_to_first_token is None:
+                time_to_first_token = time.time() - start_time
+            answer_parts.append(token)
+            on_token(token)
+        return "".join(answer_parts), {
+            'time_to_first_token': time_to_first_token,
+            'generation_time': time.time() - generation_start
+        }
+    
+    def _evaluate_answer(self, user_input: str, agent_response: str, stage1_result: Dict[str, Any],
+                         generation_time: float, show_progress: bool = True,
+                         cache_embedding: Optional[List[float]] = None):
+        """Run the Stage 3/4 judges on a generated answer and cache it if it passed.
+        
+        cache_embedding is the query vector the cache lookup already computed, if any.
+        """
+        progress = self._progress if show_progress else (lambda message: None)
+        # Fused judge: one structured call; invalid fields fall back to the per-stage judges
+        verdict = {}
+        if self.fused_judge:
+            progress("   ⚖️  Fused Judge: Checking hallucination and quality in one call...")
+            verdict = self._fused_judge(user_input, agent_response)
+        
+        if self.parallel_judges:
+            # Stage 3 and Stage 4 judges are independent of each other
+            progress("   📝 Stage 3 & ✅ Stage 4: Running output judges in parallel...")
+            stage3_future = self._judge_pool.submit(
+                self.stage3_output_generation, user_input, agent_response, generation_time,
+                verdict.get('hallucination'))
+            stage4_future = self._judge_pool.submit(
+                self.stage4_final_validation, user_input, agent_response,
+                {'generation_time_ms': generation_time * 1000}, verdict.get('quality_score'))
+            stage3_result = stage3_future.result()
+            stage4_result = stage4_future.result()
+        else:
+            # Stage 3: Output Generation
+            progress("   📝 Stage 3: Output Generation Evaluation...")
+            stage3_result = self.stage3_output_generation(
+                user_input, agent_response, generation_time, verdict.get('hallucination'))
+            
+            # Stage 4: Final Validation
+            progress("   ✅ Stage 4: Final Validation...")
+            stage4_result = self.stage4_final_validation(
+                user_input, agent_response, stage3_result, verdict.get('quality_score'))
+        
+        if self.fused_judge:
+            stage4_result['judge_rationale'] = verdict.get('rationale')
+        
+        # Only answers that passed the hallucination judge are worth reusing
+        if self._cache_options['enabled'] and not stage3_result['hallucination_detected']:
+            try:
+                self.answer_cache.put(user_input, {
+                    'agent_response': agent_response,
+                    'ambiguous': stage1_result['ambiguous'],
                     'stage3': stage3_result,
                     'stage4': stage4_result
-                },
-                'response_time': response_time,
-                'overall_score': stage4_result['response_quality_score']
+                }, embedding=cache_embedding)
+            except Exception as e:
+                # A cache that cannot store this answer must not fail the request
+                self.logger.warning(f"Failed to cache answer: {e}")
+        return stage3_result, stage4_result
+    
+    def _defer_evaluation(self, user_input: str, agent_response: str, response_time: float,
+                          stage1_result: Dict[str, Any], stage2_result: Dict[str, Any],
+                          timings: Dict[str, Any], session_id: Optional[str],
+                          cache_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Record the answer now and queue its Stage 3/4 evaluation (if sampled)"""
+        interaction_id = uuid.uuid4().hex
+        job = {
+            'interaction_id': interaction_id,
+            'user_input': user_input,
+            'agent_response': agent_response,
+            'stage1_result': stage1_result,
+            'stage2_result': stage2_result,
+            'generation_time': timings['generation_time'],
+            'cache_embedding': cache_embedding,
+            'queued_at': time.time()
+        }
+        # Record first so the interaction always precedes its evaluation in the event log
+        status = 'pending' if self.eval_queue.sample() else 'sampled_out'
+        with self._metrics_lock:
+            result = self._record_interaction(user_input, agent_response, response_time,
+                                              stage1_result, stage2_result, None, None, timings=timings,
+                                              session_id=session_id, interaction_id=interaction_id,
+                                              evaluation=status)
+            job['interaction_log'] = self.interaction_logs[-1]
+        if status == 'pending' and not self.eval_queue.submit(job):
+            status = 'dropped'
+            with self._metrics_lock:
+                job['interaction_log']['evaluation'] = status
+            self.event_log.append({
+                'event': 'evaluation',
+                'session': self.session_id,
+                'interaction_id': interaction_id,
+                'timestamp': datetime.now().isoformat(),
+                'status': status
+            })
+        self.tracer.add("deferred_evaluations_total", status='queued' if status == 'pending' else status)
+        result['evaluation'] = status
+        return result
+    
+    def _complete_deferred_evaluation(self, job: Dict[str, Any]):
+        """Background worker: judge a queued answer and append the verdict to the event log"""
+        started = time.time()
+        event = {
+            'event': 'evaluation',
+            'session': self.session_id,
+            'interaction_id': job['interaction_id'],
+            'queue_wait': started - job['queued_at']
+        }
+        try:
+            stage3_result, stage4_result = self._evaluate_answer(
+                job['user_input'], job['agent_response'], job['stage1_result'], job['generation_time'],
+                show_progress=False, cache_embedding=job['cache_embedding'])
+        except Exception as e:
+            self.tracer.add("deferred_evaluations_total", status='failed')
+            self.event_log.append(dict(event, timestamp=datetime.now().isoformat(), status='failed', reason=str(e)))
+            raise
+        
+        evaluation_summary = {
+            'stage1': job['stage1_result'],
+            'stage2': job['stage2_result'],
+            'stage3': stage3_result,
+            'stage4': stage4_result
+        }
+        event.update({
+            'timestamp': datetime.now().isoformat(),
+            'status': 'completed',
+            'evaluation_time': time.time() - started,
+            'evaluation_summary': evaluation_summary,
+            'overall_score': stage4_result['response_quality_score']
+        })
+        with self._metrics_lock:
+            job['interaction_log'].update(evaluation='completed', evaluation_summary=evaluation_summary,
+                                          overall_score=stage4_result['response_quality_score'])
+        self.aggregates.add_evaluation(event)
+        self.event_log.append(event)
+        self.tracer.add("deferred_evaluations_total", status='completed')
+    
+    @traced("request")
+    def comprehensive_evaluate(self, user_input: str,
+                               on_token: Optional[Callable[[str], None]] = None,
+                               session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Run comprehensive evaluation through all 4 stages
+        
+        When on_token is given the answer is streamed to it token by token and the
+        Stage 3/4 judges run after the full answer has been delivered. session_id
+        selects a separate conversation memory; None uses the CLI session. In deferred
+        mode (eval_sample_rate) the result carries no Stage 3/4 verdicts, only an
+        'evaluation' status: pending, sampled_out or dropped.
+        """
+        start_time = time.time()
+        
+        # Stage 1: Input Processing
+        self._progress("   🔍 Stage 1: Input Processing & Safety Checks...")
+        stage1_result = self.stage1_input_processing(user_input, check_ambiguity=False)
+        
+        # If harmful content detected, stop processing
+        if stage1_result['harmful_content']:
+            self.write_result_to_file({
+                'timestamp': datetime.now().isoformat(),
+                'session_id': session_id,
+                'user_input': user_input,
+                'status': 'blocked',
+                'reason': f"Harmful content detected (rule {stage1_result['harmful_rule']!r})",
+                'stage1': stage1_result
+            })
+            return {
+                'error': 'Harmful content detected',
+                'stage1_result': stage1_result,
+                'blocked': True
             }
+        
+        # Everything below may need a component that is still building (or failed to build)
+        # in the background; a failure is reported for this request instead of raised
+        try:
+            # Answer cache: a hit reuses the stored answer and evaluation without any LLM call
+            cache_embedding = None
+            if self._cache_options['enabled']:
+                cached, cache_embedding = self.answer_cache.lookup(user_input)
+                if cached is not None:
+                    return self._serve_cached_answer(user_input, stage1_result, cached, start_time, session_id)
+            
+            # The ambiguity judge does not depend on retrieval, so overlap it with answer generation
+            ambiguity_future = None
+            local_ambiguity = self._gate_ambiguity(user_input)
+            if local_ambiguity is not None:
+                self._record_ambiguity(stage1_result, user_input, local_ambiguity)
+            elif self.parallel_judges:
+                ambiguity_future = self._judge_pool.submit(self._judge_ambiguity, user_input)
+            else:
+                self._record_ambiguity(stage1_result, user_input, self._judge_ambiguity(user_input))
+            
+            # Stage 2: Core Execution
+            self._progress("   ⚙️  Stage 2: Core Agent Execution...")
+            stage2_result = self.stage2_core_execution(user_input, session_id)
+            
+            # Generate response
+            self._progress("   📝 Generating response...")
+            agent_response, timings = self._generate_answer(user_input, start_time, on_token)
+            generation_time = timings['generation_time']
+            
+            if ambiguity_future is not None:
+                self._record_ambiguity(stage1_result, user_input, ambiguity_future.result())
+            
+            # Deferred mode: hand the Stage 3/4 judges to the background queue and answer now
+            if self.eval_queue is not None:
+                return self._defer_evaluation(user_input, agent_response, time.time() - start_time,
+                                              stage1_result, stage2_result, timings, session_id,
+                                              cache_embedding)
+            
+            stage3_result, stage4_result = self._evaluate_answer(user_input, agent_response, stage1_result,
+                                                                 generation_time, cache_embedding=cache_embedding)
+            
+            # End-to-end: Stage 1 through the Stage 3/4 judges, as the caller experiences it
+            response_time = time.time() - start_time
+            return self._record_interaction(user_input, agent_response, response_time,
+                                            stage1_result, stage2_result, stage3_result, stage4_result,
+                                            timings=timings, session_id=session_id)
             
         except Exception as e:
-            self.evaluation_metrics['failed_responses'] += 1
+            with self._metrics_lock:
+                self.evaluation_metrics['failed_responses'] += 1
             self.logger.error(f"Error in evaluation: {e}")
+            self.write_result_to_file({
+                'timestamp': datetime.now().isoformat(),
+                'session_id': session_id,
+                'user_input': user_input,
+                'status': 'failed',
+                'reason': str(e)
+            })
             return {
                 'error': str(e),
                 'stage1_result': stage1_result,
@@ -380,6 +1166,14 @@ Question: {input}""")
     
     def write_final_report(self):
         """Write comprehensive final report when session ends"""
+        if self.eval_queue is not None:
+            # Let queued evaluations finish so the report and event log include them
+            self.eval_queue.close()
+        if self._cache_options['enabled'] and self.components.is_ready('answer_cache'):
+            self.answer_cache.close()
+        with self._metrics_lock:
+            metrics = dict(self.evaluation_metrics)
+            recent = list(self.interaction_logs)
         try:
             with open(self.result_file, 'w', encoding='utf-8') as f:
                 f.write("=" * 80 + "\n")
@@ -389,98 +1183,165 @@ Question: {input}""")
                 session_duration = (datetime.now() - self.session_start_time).total_seconds()
                 f.write(f"Total Session Time: {session_duration/60:.2f} minutes\n")
                 f.write("-" * 80 + "\n\n")
-                
-                # Comprehensive Session Metrics
-                f.write("COMPREHENSIVE SESSION METRICS:\n")
-                f.write("-" * 40 + "\n")
-                f.write(f"Total Queries Processed: {self.evaluation_metrics['total_queries']}\n")
-                f.write(f"Successful Responses: {self.evaluation_metrics['successful_responses']}\n")
-                f.write(f"Failed Responses: {self.evaluation_metrics['failed_responses']}\n")
-                
-                if self.evaluation_metrics['total_queries'] > 0:
-                    success_rate = (self.evaluation_metrics['successful_responses'] / self.evaluation_metrics['total_queries']) * 100
-                    f.write(f"Success Rate: {success_rate:.2f}%\n")
-                else:
-                    f.write("Success Rate: 0.00%\n")
-                    
-                f.write(f"Average Response Time: {self.evaluation_metrics['avg_response_time']:.2f} seconds\n")
-                f.write(f"Hallucinations Detected: {self.evaluation_metrics['hallucination_count']}\n")
-                f.write(f"Ambiguous Queries: {self.evaluation_metrics['ambiguous_queries']}\n")
-                f.write(f"Harmful Content Blocked: {self.evaluation_metrics['harmful_content_detected']}\n\n")
-                
-                # Stage-wise Performance Analysis
-                f.write("STAGE-WISE PERFORMANCE ANALYSIS:\n")
-                f.write("-" * 40 + "\n")
-                
-                stage1_issues = sum(1 for log in self.interaction_logs if 'evaluation_summary' in log and log['evaluation_summary']['stage1']['harmful_content'])
-                stage2_failures = sum(1 for log in self.interaction_logs if 'evaluation_summary' in log and not log['evaluation_summary']['stage2']['execution_successful'])
-                stage3_issues = sum(1 for log in self.interaction_logs if 'evaluation_summary' in log and log['evaluation_summary']['stage3']['hallucination_detected'])
-                stage4_failures = sum(1 for log in self.interaction_logs if 'evaluation_summary' in log and not log['evaluation_summary']['stage4']['format_valid'])
-                
-                total_processed = len([log for log in self.interaction_logs if 'evaluation_summary' in log])
-                
-                if total_processed > 0:
-                    f.write(f"Stage 1 (Input Safety): {((total_processed - stage1_issues) / total_processed * 100):.1f}% pass rate\n")
-                    f.write(f"Stage 2 (Core Execution): {((total_processed - stage2_failures) / total_processed * 100):.1f}% success rate\n")
-                    f.write(f"Stage 3 (Output Quality): {((total_processed - stage3_issues) / total_processed * 100):.1f}% quality rate\n")
-                    f.write(f"Stage 4 (Final Validation): {((total_processed - stage4_failures) / total_processed * 100):.1f}% validation rate\n\n")
-                else:
-                    f.write("No successful interactions to analyze.\n\n")
-                
-                # Quality Score Distribution
-                if self.interaction_logs:
-                    quality_scores = [log.get('overall_score', 0) for log in self.interaction_logs if 'overall_score' in log]
-                    if quality_scores:
-                        f.write("QUALITY SCORE DISTRIBUTION:\n")
-                        f.write("-" * 30 + "\n")
-                        f.write(f"Average Quality Score: {sum(quality_scores) / len(quality_scores):.2f}/10\n")
-                        f.write(f"Highest Score: {max(quality_scores)}/10\n")
-                        f.write(f"Lowest Score: {min(quality_scores)}/10\n\n")
-                
-                # All Interactions Log
-                f.write("ALL INTERACTIONS LOG:\n")
-                f.write("-" * 30 + "\n")
-                for i, log in enumerate(self.interaction_logs, 1):
-                    f.write(f"\nInteraction #{i}:\n")
-                    f.write(f"Time: {log['timestamp']}\n")
-                    f.write(f"Question: {log['user_input'][:100]}{'...' if len(log['user_input']) > 100 else ''}\n")
-                    f.write(f"Response Time: {log['response_time']:.2f}s\n")
-                    
-                    if 'evaluation_summary' in log:
-                        f.write(f"Quality Score: {log.get('overall_score', 'N/A')}/10\n")
-                        eval_summary = log['evaluation_summary']
-                        f.write("Stage Results: ")
-                        f.write(f"S1:{'✓' if not eval_summary['stage1']['harmful_content'] else '✗'} ")
-                        f.write(f"S2:{'✓' if eval_summary['stage2']['execution_successful'] else '✗'} ")
-                        f.write(f"S3:{'✓' if not eval_summary['stage3']['hallucination_detected'] else '✗'} ")
-                        f.write(f"S4:{'✓' if eval_summary['stage4']['format_valid'] else '✗'}\n")
-                    f.write("-" * 50 + "\n")
-                
+                self._write_report_body(f, metrics, recent)
                 f.write(f"\nFinal report generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
                 f.write("=" * 80 + "\n")
-                
         except Exception as e:
             self.logger.error(f"Failed to write final report: {e}")
+        finally:
+            self.event_log.close()
+        self.write_metrics()
     
     def get_evaluation_report(self) -> Dict[str, Any]:
         """Generate comprehensive evaluation report"""
-        success_rate = 0
-        if self.evaluation_metrics['total_queries'] > 0:
-            success_rate = (self.evaluation_metrics['successful_responses'] / 
-                          self.evaluation_metrics['total_queries']) * 100
-        
-        return {
-            'summary_metrics': self.evaluation_metrics,
-            'success_rate_percentage': success_rate,
-            'total_interactions': len(self.interaction_logs),
-            'last_10_interactions': self.interaction_logs[-10:] if self.interaction_logs else []
-        }
+        with self._metrics_lock:
+            success_rate = 0
+            if self.evaluation_metrics['total_queries'] > 0:
+                success_rate = (self.evaluation_metrics['successful_responses'] / 
+                              self.evaluation_metrics['total_queries']) * 100
+            
+            escalation_rate = 0
+            if self.evaluation_metrics['ambiguity_checks'] > 0:
+                escalation_rate = (self.evaluation_metrics['ambiguity_escalations'] /
+                                   self.evaluation_metrics['ambiguity_checks']) * 100
+            
+            return {
+                'summary_metrics': dict(self.evaluation_metrics),
+                'success_rate_percentage': success_rate,
+                'ambiguity_escalation_rate_percentage': escalation_rate,
+                'total_interactions': self.aggregates.evaluated,
+                'aggregates': self.aggregates.to_dict(),
+                'tracing': self.tracer.to_dict(),
+                'startup': self.startup_report(),
+                'llm_client': self.components.get('llm_client').stats if self.components.is_ready('llm_client') else None,
+                'deferred_evaluation': self.eval_queue.to_dict() if self.eval_queue is not None else None,
+                'last_10_interactions': list(self.interaction_logs)
+            }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Document Reading Chatbot with Comprehensive Evaluation")
+    parser.add_argument('--doc', default="d1.txt",
+                        help="Document, directory or glob of documents to answer questions about")
+    parser.add_argument('--parallel', action='store_true',
+                        help="Overlap independent LLM judge calls instead of running them serially")
+    parser.add_argument('--fused-judge', action='store_true',
+                        help="Judge hallucination and quality with a single structured LLM call")
+    parser.add_argument('--stream', action='store_true',
+                        help="Print answer tokens as they arrive and run the judges afterwards")
+    parser.add_argument('--batch', metavar='QUESTIONS_JSONL',
+                        help="Evaluate every question in a JSONL file instead of starting the interactive loop")
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help="Number of questions evaluated concurrently in batch mode")
+    parser.add_argument('--output', default="batch_results.jsonl",
+                        help="JSONL file batch results are appended to (and resumed from)")
+    parser.add_argument('--serve', action='store_true',
+                        help="Serve questions over HTTP with per-session memory instead of the interactive loop")
+    parser.add_argument('--host', default="127.0.0.1", help="Host to bind in serve mode")
+    parser.add_argument('--port', type=int, default=8000, help="Port to bind in serve mode")
+    parser.add_argument('--max-in-flight', type=int, default=16,
+                        help="Questions evaluated at once in serve mode; extra requests get HTTP 503")
+    parser.add_argument('--memory-tokens', type=int, default=2000,
+                        help="Token budget of the conversation memory window (0 keeps the full history)")
+    parser.add_argument('--summarize-memory', action='store_true',
+                        help="Fold turns that leave the memory window into a rolling LLM summary")
+    parser.add_argument('--retrieval', choices=['vector', 'hybrid'], default='vector',
+                        help="Vector similarity only, or BM25 + vector fused with reciprocal rank fusion")
+    parser.add_argument('--retrieval-k', type=int, default=4, help="Number of chunks passed to the answer prompt")
+    parser.add_argument('--lexical-fast-path', action='store_true',
+                        help="In hybrid mode, answer keyword-style queries from BM25 alone when it is confident")
+    parser.add_argument('--vector-backend', choices=['chroma', 'numpy'], default='chroma',
+                        help="Chroma collection, or a memory-mapped NumPy matrix for small corpora")
+    parser.add_argument('--ann-nprobe', type=int, default=None,
+                        help="NumPy backend: search an IVF approximate index scanning this many buckets")
+    parser.add_argument('--ann-nlist', type=int, default=None,
+                        help="Number of IVF buckets (default: 4 * sqrt(chunk count))")
+    parser.add_argument('--harmful-patterns', nargs='+', default=None,
+                        help="Pattern files for the Stage 1 harmful-content filter (default: utils/policies/harmful.txt)")
+    parser.add_argument('--injection-patterns', nargs='+', default=None,
+                        help="Pattern files for the Stage 1 prompt-injection filter (default: utils/policies/injection.txt)")
+    parser.add_argument('--context-tokens', type=int, default=None,
+                        help="Pack retrieved chunks (merge overlaps, drop duplicates) into at most this many prompt tokens (min 40)")
+    parser.add_argument('--context-mmr', type=float, default=None, metavar='LAMBDA',
+                        help="With --context-tokens, diversify passages by maximal marginal relevance (1.0 = relevance only)")
+    parser.add_argument('--warm-up', action='store_true',
+                        help="Show the prompt immediately and build the index and LLM client in the background")
+    parser.add_argument('--ambiguity-gate', action='store_true',
+                        help="Decide clearly specific or clearly vague questions locally; only the rest go to the LLM judge")
+    parser.add_argument('--eval-sample-rate', type=float, default=None, metavar='RATE',
+                        help="Return answers right after generation and judge this fraction of them (0-1) in the background")
+    parser.add_argument('--eval-queue-size', type=int, default=100,
+                        help="Maximum number of answers waiting for background evaluation")
+    parser.add_argument('--eval-queue-policy', choices=['drop', 'block'], default='drop',
+                        help="When the evaluation queue is full, skip the evaluation or make the request wait")
+    parser.add_argument('--eval-workers', type=int, default=1,
+                        help="Background threads running deferred evaluations")
+    parser.add_argument('--llm-rpm', type=float, default=None,
+                        help="Throttle LLM calls to this many requests per minute")
+    parser.add_argument('--llm-tpm', type=float, default=None,
+                        help="Throttle LLM calls to this many (estimated) tokens per minute")
+    parser.add_argument('--llm-retries', type=int, default=3,
+                        help="Retries with jittered exponential backoff for a failed LLM call")
+    parser.add_argument('--cache', action='store_true',
+                        help="Reuse stored answers and evaluations for repeated questions")
+    parser.add_argument('--cache-similarity', type=float, default=None,
+                        help="Also reuse answers for questions whose embedding similarity reaches this threshold")
+    return parser.parse_args(argv)
 
-def main():
+def main(argv=None):
+    args = parse_args(argv)
+    
     # Initialize evaluator
     print("🚀 Initializing Document Reading Chatbot with Evaluation Pipeline...")
-    evaluator = ComprehensiveAgentEvaluator("d1.txt")
+    evaluator = ComprehensiveAgentEvaluator(
+        args.doc,
+        parallel_judges=args.parallel,
+        fused_judge=args.fused_judge,
+        use_cache=args.cache or args.cache_similarity is not None,
+        cache_similarity=args.cache_similarity,
+        memory_token_budget=args.memory_tokens or None,
+        summarize_memory=args.summarize_memory,
+        retrieval=args.retrieval,
+        retrieval_k=args.retrieval_k,
+        lexical_fast_path=args.lexical_fast_path,
+        vector_backend=args.vector_backend,
+        ann_nprobe=args.ann_nprobe,
+        ann_nlist=args.ann_nlist,
+        harmful_patterns=args.harmful_patterns,
+        injection_patterns=args.injection_patterns,
+        ambiguity_gate=args.ambiguity_gate,
+        warm_up=args.warm_up,
+        context_tokens=args.context_tokens,
+        context_mmr=args.context_mmr,
+        eval_sample_rate=args.eval_sample_rate,
+        eval_queue_size=args.eval_queue_size,
+        eval_queue_policy=args.eval_queue_policy,
+        eval_workers=args.eval_workers,
+        llm_requests_per_minute=args.llm_rpm,
+        llm_tokens_per_minute=args.llm_tpm,
+        llm_max_retries=args.llm_retries,
+        request_concurrency=args.max_in_flight if args.serve else args.concurrency if args.batch else 1
+    )
     print(f"✅ Evaluation system initialized. Results will be saved to: {evaluator.result_file}")
+    startup = evaluator.startup_report()
+    print(f"⏱️  Startup: module import {startup['module_import_seconds']:.2f}s, init {startup['init_seconds']:.2f}s"
+          + (" (index and LLM client warming up in the background)" if args.warm_up else ""))
+    
+    if args.serve:
+        from server import run_server
+        run_server(evaluator, host=args.host, port=args.port, max_in_flight=args.max_in_flight)
+        evaluator.write_final_report()
+        return
+    
+    if args.batch:
+        from batch_evaluation import run_batch
+        print(f"\n📦 Running batch evaluation of {args.batch} with concurrency {args.concurrency}...")
+        stats = run_batch(evaluator, args.batch, args.output, concurrency=args.concurrency)
+        evaluator.write_final_report()
+        print("\n📊 Batch Summary:")
+        print(f"   Completed: {stats['ok']}  Blocked: {stats['blocked']}  Failed: {stats['failed']}  Skipped (resumed): {stats['skipped']}")
+        print(f"   Throughput: {stats['questions_per_second']:.2f} questions/s over {stats['elapsed_seconds']:.1f}s")
+        print(f"✅ Per-question results written to: {args.output}")
+        return
     
     print("\n🤖 Welcome to the Comprehensive Document Reading Chatbot with Full Evaluation!")
     print("This chatbot implements a 4-stage evaluation pipeline:")
@@ -516,7 +1377,9 @@ def main():
         if question.lower() == 'report':
             print("\n📊 Current Evaluation Report:")
             report = evaluator.get_evaluation_report()
-            print(json.dumps(report, indent=2))
+            print(json.dumps(report, indent=2, default=str))
+            evaluator.write_report()
+            print(f"📝 Report written to: {evaluator.result_file} (Prometheus metrics: {evaluator.metrics_file})")
             continue
         
         # Skip empty questions
@@ -527,32 +1390,47 @@ def main():
         print("\n🔄 Running comprehensive 4-stage evaluation...")
         print("   🔍 Stage 1: Input Processing & Safety Checks...")
         
-        # Run comprehensive evaluation
-        result = evaluator.comprehensive_evaluate(question)
+        # Run comprehensive evaluation, streaming the answer when requested
+        streamed_tokens = []
+        
+        def print_token(token):
+            if not streamed_tokens:
+                print("\n🤖 Answer: ", end="", flush=True)
+            streamed_tokens.append(token)
+            print(token, end="", flush=True)
+        
+        result = evaluator.comprehensive_evaluate(question, on_token=print_token if args.stream else None)
+        if streamed_tokens:
+            print()
         
         if 'error' in result:
             print(f"❌ Error: {result['error']}")
             if 'blocked' in result:
-                print("🚫 Query blocked due to safety concerns.")
-                # Still write to result file even for blocked queries
-                evaluator.write_result_to_file({
-                    'timestamp': datetime.now().isoformat(),
-                    'user_input': question,
-                    'status': 'blocked',
-                    'reason': result['error']
-                })
+                print(f"🚫 Query blocked due to safety concerns (rule: {result['stage1_result']['harmful_rule']}).")
             continue
         
         # Display results
-        print(f"\n🤖 Answer: {result['agent_response']}")
+        if not streamed_tokens:
+            print(f"\n🤖 Answer: {result['agent_response']}")
         print(f"\n📈 Evaluation Summary:")
         print(f"   ⏱️  Response Time: {result['response_time']:.2f}s")
-        print(f"   🎯 Quality Score: {result['overall_score']}/10")
+        if result.get('time_to_first_token') is not None:
+            print(f"   ⚡ Time to First Token: {result['time_to_first_token']:.2f}s")
+            print(f"   ✍️  Generation Time: {result['generation_time']:.2f}s")
+        if result.get('cache_hit'):
+            print("   ♻️  Served from answer cache")
+        if 'evaluation' not in result:
+            print(f"   🎯 Quality Score: {format_score(result['overall_score'])}/10")
         
         # Stage results
         eval_summary = result['evaluation_summary']
         print(f"   🔍 Stage 1 - Input Safety: {'✅ Pass' if not eval_summary['stage1']['harmful_content'] else '❌ Blocked'}")
+        if eval_summary['stage1'].get('injection_rule'):
+            print(f"      ⚠️  Prompt injection rule matched: {eval_summary['stage1']['injection_rule']}")
         print(f"   ⚙️  Stage 2 - Execution: {'✅ Success' if eval_summary['stage2']['execution_successful'] else '❌ Failed'}")
+        if 'stage3' not in eval_summary:
+            print(f"   ⏳ Stages 3-4: {'judging in the background' if result['evaluation'] == 'pending' else result['evaluation'].replace('_', ' ')}")
+            continue
         print(f"   📝 Stage 3 - Output Quality: {'✅ Good' if not eval_summary['stage3']['hallucination_detected'] else '⚠️  Hallucination Detected'}")
         print(f"   ✅ Stage 4 - Final Validation: {'✅ Valid' if eval_summary['stage4']['format_valid'] else '❌ Invalid Format'}")
 
@@ -0,0 +1,147 @@
+"""
+Concurrent multi-session HTTP serving mode.
+One asyncio server shares a single evaluator (retriever, LLM client, metrics) across all
+requests, keeps a separate conversation memory per session and rejects work beyond a
+maximum number of in-flight questions so overload turns into fast 503s instead of queueing.
+
+Endpoints:
+    POST /ask      {"question": "...", "session_id": "..."}  -> evaluation result
+    GET  /report   session-wide evaluation report
+    GET  /metrics  latency histograms and counters in Prometheus text format
+    GET  /health   liveness and current load
+"""
+
+import asyncio
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from typing import Any, Dict, Optional, Tuple
+
+MAX_BODY_BYTES = 1 << 20
+
+class EvaluationServer:
+    def __init__(self, evaluator, host: str = "127.0.0.1", port: int = 8000, max_in_flight: int = 16):
+        self.evaluator = evaluator
+        self.host = host
+        self.port = port
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.rejected = 0
+        # Pipeline calls are blocking, so they run on a pool sized to the in-flight limit
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="serve")
+        self.evaluator.show_progress = False
+    
+    async def _read_request(self, reader) -> Tuple[str, str, bytes]:
+        request_line = (await reader.readline()).decode('latin-1').strip()
+        if not request_line:
+            raise ValueError("Empty request")
+        method, path, _ = request_line.split(' ', 2)
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+        if length > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), path.split('?', 1)[0], body
+    
+    async def _write_response(self, writer, status: HTTPStatus, payload: Dict[str, Any],
+                              extra_headers: Optional[Dict[str, str]] = None):
+        await self._write_body(writer, status, json.dumps(payload, default=str).encode('utf-8'),
+                               'application/json', extra_headers)
+    
+    async def _write_body(self, writer, status: HTTPStatus, body: bytes, content_type: str,
+                          extra_headers: Optional[Dict[str, str]] = None):
+        headers = {
+            'Content-Type': content_type,
+            'Content-Length': str(len(body)),
+            'Connection': 'close'
+        }
+        headers.update(extra_headers or {})
+        head = f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        writer.write(head.encode('latin-1') + b"\r\n" + body)
+        await writer.drain()
+    
+    async def _ask(self, body: bytes) -> Tuple[HTTPStatus, Dict[str, Any], Optional[Dict[str, str]]]:
+        try:
+            payload = json.loads(body or b'{}')
+        except json.JSONDecodeError:
+            return HTTPStatus.BAD_REQUEST, {'error': 'Body must be JSON'}, None
+        question = str(payload.get('question', '')).strip()
+        if not question:
+            return HTTPStatus.BAD_REQUEST, {'error': "Missing 'question'"}, None
+        session_id = str(payload.get('session_id') or uuid.uuid4().hex)
+        
+        # Backpressure: shed load immediately rather than letting requests pile up
+        if self.in_flight >= self.max_in_flight:
+            self.rejected += 1
+            return HTTPStatus.SERVICE_UNAVAILABLE, {'error': 'Server busy, retry later'}, {'Retry-After': '1'}
+        
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self.executor,
+                partial(self.evaluator.comprehensive_evaluate, question, session_id=session_id)
+            )
+        finally:
+            self.in_flight -= 1
+        
+        result['session_id'] = session_id
+        if result.get('blocked'):
+            return HTTPStatus.UNPROCESSABLE_ENTITY, result, None
+        if 'error' in result:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, result, None
+        return HTTPStatus.OK, result, None
+    
+    async def handle(self, reader, writer):
+        try:
+            try:
+                method, path, body = await self._read_request(reader)
+            except (ValueError, asyncio.IncompleteReadError) as e:
+                await self._write_response(writer, HTTPStatus.BAD_REQUEST, {'error': str(e)})
+                return
+            
+            if method == 'POST' and path == '/ask':
+                status, payload, headers = await self._ask(body)
+                await self._write_response(writer, status, payload, headers)
+            elif method == 'GET' and path == '/report':
+                await self._write_response(writer, HTTPStatus.OK, self.evaluator.get_evaluation_report())
+            elif method == 'GET' and path == '/metrics':
+                await self._write_body(writer, HTTPStatus.OK, self.evaluator.tracer.to_prometheus().encode('utf-8'),
+                                       'text/plain; version=0.0.4')
+            elif method == 'GET' and path == '/health':
+                await self._write_response(writer, HTTPStatus.OK, {
+                    'status': 'ok',
+                    'in_flight': self.in_flight,
+                    'max_in_flight': self.max_in_flight,
+                    'rejected': self.rejected
+                })
+            else:
+                await self._write_response(writer, HTTPStatus.NOT_FOUND, {'error': f"No route for {method} {path}"})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    async def serve_forever(self):
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"🌐 Serving on http://{self.host}:{self.port} (max in-flight: {self.max_in_flight})")
+        async with server:
+            await server.serve_forever()
+
+def run_server(evaluator, host: str = "127.0.0.1", port: int = 8000, max_in_flight: int = 16):
+    server = EvaluationServer(evaluator, host=host, port=port, max_in_flight=max_in_flight)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.executor.shutdown(wait=False)
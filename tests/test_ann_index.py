@@ -0,0 +1,82 @@
+import zlib
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from utils.ann_index import IVFIndex
+from utils.numpy_index import NumpyVectorStore
+
+def _clustered(rows=2000, dimension=32, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension))
+    matrix = centers[rng.integers(clusters, size=rows)] + 0.1 * rng.normal(size=(rows, dimension))
+    return (matrix / np.linalg.norm(matrix, axis=1, keepdims=True)).astype(np.float32)
+
+def test_ivf_recall_against_exact_search():
+    matrix = _clustered()
+    index = IVFIndex(nlist=32, nprobe=4)
+    index.train(matrix)
+    assert index.nlist == 32 and len(index.assignments) == len(matrix)
+    hits = 0
+    for row in range(0, len(matrix), 50):
+        query = matrix[row]
+        exact = set(np.argsort(-(matrix @ query))[:10])
+        candidates = index.candidates(query)
+        approximate = set(candidates[np.argsort(-(matrix[candidates] @ query))[:10]])
+        hits += len(exact & approximate)
+    assert hits / (10 * len(range(0, len(matrix), 50))) >= 0.9
+
+def test_ivf_add_keep_rows_and_round_trip(tmp_path):
+    matrix = _clustered(rows=500)
+    index = IVFIndex(nlist=8)
+    index.train(matrix[:400])
+    index.add(matrix[400:])
+    assert len(index.assignments) == 500
+    keep = np.ones(500, dtype=bool)
+    keep[:100] = False
+    index.keep_rows(keep)
+    assert len(index.assignments) == 400
+    assert sorted(index.candidates(matrix[0], nprobe=8)) == list(range(400))
+
+    path = str(tmp_path / "ann.npz")
+    index.save(path)
+    loaded = IVFIndex.load(path)
+    assert loaded.nlist == 8 and loaded.trained_size == 400
+    np.testing.assert_array_equal(loaded.assignments, index.assignments)
+
+class SeededEmbeddings(Embeddings):
+    """Pseudo-random vectors seeded by the text, so equal texts embed equally"""
+
+    def embed_query(self, text):
+        return np.random.default_rng(zlib.crc32(text.encode())).normal(size=64).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+def _store(rows=300):
+    texts = [f"document {i} about topic {i % 17} and subject {i % 5}" for i in range(rows)]
+    return NumpyVectorStore.from_texts(texts, SeededEmbeddings())
+
+def test_loaded_index_stays_exact_until_enabled(tmp_path):
+    store = _store()
+    store.enable_ann(nlist=8, min_rows=10)
+    assert store._use_ann()
+    store.save(str(tmp_path))
+
+    loaded = NumpyVectorStore.load(str(tmp_path), SeededEmbeddings())
+    assert loaded._ann is not None and not loaded._use_ann()
+    loaded.add_texts(["one more document"])
+    assert len(loaded._ann.assignments) == len(loaded)
+    loaded.enable_ann(nlist=8, min_rows=10)
+    assert loaded._use_ann()
+
+def test_enable_ann_retrains_when_nlist_changes():
+    store = _store()
+    assert store.enable_ann(nlist=8, min_rows=10)
+    assert not store.enable_ann(nlist=8, min_rows=10)
+    assert store.enable_ann(nlist=16, min_rows=10)
+    assert store._ann.nlist == 16
+
+def test_ann_not_used_below_min_rows():
+    store = _store(rows=50)
+    assert not store.enable_ann(min_rows=100)
+    assert not store._use_ann()
+    assert len(store.similarity_search("topic 3", k=3)) == 3
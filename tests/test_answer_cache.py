@@ -0,0 +1,91 @@
+import json
+import threading
+from utils.answer_cache import AnswerCache, normalize_query
+
+class CountingEmbedder:
+    """Embeds by keyword so similar questions get identical vectors; counts calls"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        lowered = text.lower()
+        return [float('refund' in lowered), float('shipping' in lowered), 1.0]
+
+def test_normalize_query():
+    assert normalize_query("  What is the Refund policy?? ") == "what is the refund policy"
+
+def test_exact_hit_after_put(tmp_path):
+    cache = AnswerCache(str(tmp_path / "cache.json"))
+    assert cache.get("What is the refund policy?") is None
+    cache.put("What is the refund policy?", {'answer': "30 days"})
+    assert cache.get("what is the REFUND policy") == {'answer': "30 days"}
+    assert cache.stats['hits'] == 1 and cache.stats['misses'] == 1
+
+def test_semantic_hit_and_embedding_reuse(tmp_path):
+    embed = CountingEmbedder()
+    cache = AnswerCache(str(tmp_path / "cache.json"), embed_fn=embed, similarity_threshold=0.99)
+    cache.put("How do refunds work?", {'answer': "30 days"})
+    assert embed.calls == 1
+
+    value, vector = cache.lookup("Tell me about the refund rules")
+    assert value == {'answer': "30 days"} and cache.stats['semantic_hits'] == 1
+
+    value, vector = cache.lookup("How long does shipping take?")
+    assert value is None and vector is not None
+    calls = embed.calls
+    cache.put("How long does shipping take?", {'answer': "5 days"}, embedding=vector)
+    assert embed.calls == calls
+
+def test_ttl_and_lru_eviction(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("utils.answer_cache.time.time", lambda: now[0])
+    cache = AnswerCache(str(tmp_path / "cache.json"), max_entries=2, ttl_seconds=60)
+    cache.put("first", {'answer': 1})
+    cache.put("second", {'answer': 2})
+    cache.get("first")
+    cache.put("third", {'answer': 3})
+    assert cache.get("second") is None
+    assert cache.get("first") == {'answer': 1}
+    now[0] += 61
+    assert cache.get("third") is None
+
+def test_persistence_is_tied_to_index_version(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = AnswerCache(path, index_version="v1", save_interval=3600)
+    cache.put("question", {'answer': "yes"})
+    assert not (tmp_path / "cache.json").exists()  # debounced until close
+    cache.close()
+    assert AnswerCache(path, index_version="v1").get("question") == {'answer': "yes"}
+    assert AnswerCache(path, index_version="v2").get("question") is None
+
+def test_concurrent_puts_and_saves(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = AnswerCache(str(path), max_entries=1000, save_interval=0)
+    errors = []
+
+    def worker(thread):
+        try:
+            for i in range(25):
+                cache.put(f"question {thread} {i}", {'answer': i})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cache.close()
+
+    assert errors == []
+    assert [p.name for p in tmp_path.iterdir()] == ["cache.json"]
+    assert len(json.loads(path.read_text(encoding="utf-8"))['entries']) == 200
+
+def test_failed_save_is_not_raised(tmp_path):
+    cache = AnswerCache(str(tmp_path / "missing" / "cache.json"), save_interval=0)
+    cache.put("question", {'answer': "yes"})
+    assert cache.save() is False
+    assert cache.get("question") == {'answer': "yes"}
+    cache.path = None  # nothing left for the exit hook to retry
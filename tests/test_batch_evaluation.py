@@ -0,0 +1,51 @@
+import json
+import threading
+from batch_evaluation import load_completed_ids, run_batch
+
+class RecordingEvaluator:
+    """Stand-in evaluator: fails questions containing 'boom', blocks ones containing 'hack'"""
+
+    def __init__(self):
+        self.asked = []
+        self._lock = threading.Lock()
+
+    def comprehensive_evaluate(self, question):
+        with self._lock:
+            self.asked.append(question)
+        if "boom" in question:
+            raise RuntimeError("judge unavailable")
+        return {'blocked': "hack" in question, 'answer': question.upper()}
+
+def _write_lines(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records), encoding="utf-8")
+
+def test_missing_output_means_nothing_completed(tmp_path):
+    assert load_completed_ids(str(tmp_path / "absent.jsonl")) == set()
+
+def test_torn_last_line_is_truncated(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_bytes(b'{"id": "q1", "status": "ok"}\n{"id": "q2", "status": "failed"}\n{"id": "q3", "sta')
+    assert load_completed_ids(str(path)) == {"q1"}
+    assert path.read_bytes() == b'{"id": "q1", "status": "ok"}\n{"id": "q2", "status": "failed"}\n'
+
+def test_torn_only_line_empties_the_file(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_bytes(b'{"id": "q1", "sta')
+    assert load_completed_ids(str(path)) == set()
+    assert path.read_bytes() == b""
+
+def test_resume_skips_finished_and_retries_failed(tmp_path):
+    questions = tmp_path / "questions.jsonl"
+    _write_lines(questions, [{'id': "q1", 'question': "first"}, {'id': "q2", 'question': "second"},
+                             {'id': "q3", 'question': "hack it"}, {'id': "q4", 'question': "boom"}])
+    output = tmp_path / "results.jsonl"
+    output.write_bytes(b'{"id": "q1", "status": "ok"}\n{"id": "q2", "status": "failed"}\n{"id": "q3", "st')
+
+    evaluator = RecordingEvaluator()
+    stats = run_batch(evaluator, str(questions), str(output), concurrency=2)
+    assert sorted(evaluator.asked) == ["boom", "hack it", "second"]
+    assert (stats['ok'], stats['blocked'], stats['failed'], stats['skipped']) == (1, 1, 1, 1)
+
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert {record['id']: record['status'] for record in records[2:]} == {"q2": "ok", "q3": "blocked", "q4": "failed"}
+    assert load_completed_ids(str(output)) == {"q1", "q2", "q3"}
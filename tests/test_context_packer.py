@@ -0,0 +1,68 @@
+import pytest
+from langchain_core.documents import Document
+from utils.context_packer import MIN_TRIMMED_TOKENS, ContextPacker
+from utils.memory import estimate_tokens
+
+SOURCE_TEXT = ("Alpha clause covers the warranty period. Beta clause limits liability for damages. "
+               "Gamma clause sets the governing law. Delta clause describes termination rights.")
+
+def _chunk(start, end, source='contract.pdf', **metadata):
+    return Document(page_content=SOURCE_TEXT[start:end], metadata=dict(metadata, source=source, start_index=start))
+
+def test_overlapping_chunks_merge_by_start_index():
+    packed = ContextPacker(max_tokens=1000).pack([_chunk(40, 120), _chunk(0, 60)])
+    assert len(packed) == 1
+    assert packed[0].page_content == SOURCE_TEXT[0:120]
+    assert packed[0].metadata['merged_chunks'] == 2
+
+def test_overlap_merge_bridges_earlier_passages():
+    packed = ContextPacker(max_tokens=1000).pack([_chunk(0, 50), _chunk(90, len(SOURCE_TEXT)), _chunk(40, 100)])
+    assert [doc.page_content for doc in packed] == [SOURCE_TEXT]
+
+def test_chunks_from_other_sources_are_not_merged():
+    packed = ContextPacker(max_tokens=1000).pack([_chunk(0, 60), _chunk(40, 120, source='other.pdf')])
+    assert len(packed) == 2
+
+def test_text_overlap_merge_without_start_index():
+    first = Document(page_content=SOURCE_TEXT[:90], metadata={'source': 'contract.pdf'})
+    second = Document(page_content=SOURCE_TEXT[40:], metadata={'source': 'contract.pdf'})
+    packed = ContextPacker(max_tokens=1000).pack([second, first])
+    assert [doc.page_content for doc in packed] == [SOURCE_TEXT]
+
+def test_near_duplicates_are_dropped():
+    text = "the supplier must deliver all goods within ten business days of the order date"
+    original = Document(page_content=text, metadata={'source': 'a'})
+    duplicate = Document(page_content=text + " exactly", metadata={'source': 'b'})
+    other = Document(page_content="payment is due thirty days after the invoice is received", metadata={'source': 'c'})
+    packed = ContextPacker(max_tokens=1000, dedupe_threshold=0.8).pack([original, duplicate, other])
+    assert [doc.metadata['source'] for doc in packed] == ['a', 'c']
+
+def test_budget_trims_the_last_passage():
+    documents = [Document(page_content=f"Sentence {i} of passage {n} is here. " * 10, metadata={'source': str(n)})
+                 for n, i in enumerate(range(3))]
+    packer = ContextPacker(max_tokens=estimate_tokens(documents[0].page_content) + 40)
+    packed = packer.pack(documents)
+    assert len(packed) == 2
+    assert packed[1].metadata['truncated'] is True
+    assert packer.measure(packed)['tokens'] <= packer.max_tokens
+
+def test_oversized_top_passage_is_trimmed_not_dropped():
+    document = Document(page_content="Clause one applies here. " * 40, metadata={'source': 'a'})
+    packed = ContextPacker(max_tokens=MIN_TRIMMED_TOKENS).pack([document])
+    assert len(packed) == 1 and packed[0].metadata['truncated'] is True
+    assert 0 < estimate_tokens(packed[0].page_content) <= MIN_TRIMMED_TOKENS
+
+def test_budget_below_a_trimmed_passage_is_rejected():
+    with pytest.raises(ValueError):
+        ContextPacker(max_tokens=MIN_TRIMMED_TOKENS - 1)
+
+def test_mmr_keeps_every_passage():
+    documents = [Document(page_content=text, metadata={'source': str(i)}) for i, text in enumerate(
+        ["refund policy details", "refund policy summary", "shipping times and carriers"])]
+    packed = ContextPacker(max_tokens=1000, mmr_lambda=0.5).pack(documents, query="refund policy")
+    assert packed[0].page_content == "refund policy details"
+    assert sorted(doc.page_content for doc in packed) == sorted(doc.page_content for doc in documents)
+
+def test_measure():
+    documents = [Document(page_content="a" * 40), Document(page_content="b" * 8)]
+    assert ContextPacker.measure(documents) == {'chunks': 2, 'tokens': estimate_tokens("a" * 40) + estimate_tokens("b" * 8)}
@@ -0,0 +1,51 @@
+from langchain_core.documents import Document
+from utils.embedder import assign_chunk_ids, sync_vector_store_batches
+from utils.fakes import FakeEmbeddings
+from utils.numpy_index import NumpyVectorStore
+
+class CountingEmbeddings(FakeEmbeddings):
+    def __init__(self):
+        super().__init__(dimension=32)
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+PARAGRAPHS = [f"Paragraph {i} explains topic {i}." for i in range(6)]
+
+def _batches(paragraphs, batch_size=2):
+    docs = [Document(page_content=text, metadata={'source': "doc.txt"}) for text in paragraphs]
+    return [docs[i:i + batch_size] for i in range(0, len(docs), batch_size)]
+
+def test_editing_one_paragraph_only_touches_its_chunk():
+    embeddings = CountingEmbeddings()
+    store = NumpyVectorStore(embeddings)
+    stats = sync_vector_store_batches(store, _batches(PARAGRAPHS))
+    assert stats == {'added': 6, 'removed': 0, 'unchanged': 0}
+    before = set(store.get(include=[])['ids'])
+
+    edited = list(PARAGRAPHS)
+    edited[3] = "Paragraph 3 now explains something else."
+    embeddings.embedded.clear()
+    stats = sync_vector_store_batches(store, _batches(edited))
+    after = set(store.get(include=[])['ids'])
+
+    assert stats == {'added': 1, 'removed': 1, 'unchanged': 5}
+    assert embeddings.embedded == [edited[3]]
+    assert after - before == set(assign_chunk_ids(_batches([edited[3]])[0]))
+    assert before - after == set(assign_chunk_ids(_batches([PARAGRAPHS[3]])[0]))
+
+def test_unchanged_corpus_embeds_nothing():
+    embeddings = CountingEmbeddings()
+    store = NumpyVectorStore(embeddings)
+    sync_vector_store_batches(store, _batches(PARAGRAPHS))
+    embeddings.embedded.clear()
+    assert sync_vector_store_batches(store, _batches(PARAGRAPHS, batch_size=4)) == {
+        'added': 0, 'removed': 0, 'unchanged': 6}
+    assert embeddings.embedded == []
+
+def test_repeated_chunks_across_batches_get_distinct_ids():
+    store = NumpyVectorStore(FakeEmbeddings(dimension=32))
+    stats = sync_vector_store_batches(store, _batches(["same text", "other", "same text"], batch_size=1))
+    assert stats['added'] == 3 and len(store) == 3
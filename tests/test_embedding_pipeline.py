@@ -0,0 +1,65 @@
+import threading
+import time
+import pytest
+from utils.embedding_pipeline import embed_in_batches
+from utils.fakes import FakeEmbeddings
+from utils.rate_limit import TokenBucket
+
+class FlakyEmbed:
+    """Fails the first ``failures`` calls for each batch, then embeds with FakeEmbeddings"""
+
+    def __init__(self, failures=1):
+        self.embeddings = FakeEmbeddings(dimension=16)
+        self.failures = failures
+        self.calls = []
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, batch):
+        with self._lock:
+            self.calls.append((time.monotonic(), tuple(batch)))
+            attempt = self._attempts.get(batch[0], 0)
+            self._attempts[batch[0]] = attempt + 1
+        if attempt < self.failures:
+            raise RuntimeError("quota exceeded")
+        return self.embeddings.embed_documents(batch)
+
+class CountingBucket(TokenBucket):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.acquired = 0
+
+    def acquire(self, tokens=1.0):
+        self.acquired += 1
+        return super().acquire(tokens)
+
+TEXTS = [f"chunk {i} about topic {i % 3}" for i in range(10)]
+
+def test_vectors_keep_input_order_across_batches():
+    vectors, stats = embed_in_batches(TEXTS, FakeEmbeddings(dimension=16).embed_documents, batch_size=3, max_workers=4)
+    assert vectors == FakeEmbeddings(dimension=16).embed_documents(TEXTS)
+    assert stats['chunks'] == 10 and stats['batches'] == 4
+
+def test_failed_batches_are_retried_with_backoff():
+    embed = FlakyEmbed(failures=1)
+    vectors, _ = embed_in_batches(TEXTS, embed, batch_size=4, max_workers=2, base_delay=0.05)
+    assert vectors == FakeEmbeddings(dimension=16).embed_documents(TEXTS)
+    assert len(embed.calls) == 6
+    for batch in {batch for _, batch in embed.calls}:
+        first, second = [at for at, seen in embed.calls if seen == batch]
+        assert second - first >= 0.05 * 0.5
+
+def test_retries_give_up_after_max_retries():
+    embed = FlakyEmbed(failures=5)
+    with pytest.raises(RuntimeError):
+        embed_in_batches(TEXTS[:2], embed, max_retries=2, base_delay=0.001)
+    assert len(embed.calls) == 3
+
+def test_rate_limiter_gates_every_attempt():
+    bucket = CountingBucket(rate=40, capacity=1)
+    embed = FlakyEmbed(failures=1)
+    start = time.monotonic()
+    embed_in_batches(TEXTS, embed, batch_size=5, max_workers=2, rate_limiter=bucket, base_delay=0.001)
+    # Two batches, each failing once: four attempts, three of which wait for a refill
+    assert bucket.acquired == len(embed.calls) == 4
+    assert time.monotonic() - start >= 3 / 40 * 0.9
@@ -0,0 +1,83 @@
+import threading
+import pytest
+from utils.eval_queue import EvaluationQueue
+
+class GatedHandler:
+    """Handler that blocks until released, recording every job it ran"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.jobs = []
+
+    def __call__(self, job):
+        self.started.set()
+        self.release.wait(5)
+        if job == "bad":
+            raise ValueError("judge failed")
+        self.jobs.append(job)
+
+def test_drop_policy_drops_when_full():
+    handler = GatedHandler()
+    evaluations = EvaluationQueue(handler, max_size=1, policy='drop')
+    assert evaluations.submit(1)
+    assert handler.started.wait(5)  # worker holds job 1, the queue is empty again
+    assert evaluations.submit(2)
+    assert not evaluations.submit(3)
+    handler.release.set()
+    evaluations.close(timeout=5)
+    assert handler.jobs == [1, 2]
+    assert evaluations.to_dict()['queued'] == 2 and evaluations.to_dict()['dropped'] == 1
+
+def test_block_policy_waits_for_a_free_slot():
+    handler = GatedHandler()
+    evaluations = EvaluationQueue(handler, max_size=1, policy='block')
+    evaluations.submit(1)
+    assert handler.started.wait(5)
+    evaluations.submit(2)
+    blocked = threading.Thread(target=evaluations.submit, args=(3,))
+    blocked.start()
+    blocked.join(0.1)
+    assert blocked.is_alive()
+    handler.release.set()
+    blocked.join(5)
+    assert not blocked.is_alive()
+    evaluations.close(timeout=5)
+    assert handler.jobs == [1, 2, 3]
+    assert evaluations.to_dict()['dropped'] == 0
+
+def test_submit_after_close_is_dropped_and_failures_are_counted():
+    handler = GatedHandler()
+    handler.release.set()
+    evaluations = EvaluationQueue(handler, policy='block', workers=2)
+    evaluations.submit("bad")
+    evaluations.submit("good")
+    evaluations.close(timeout=5)
+    assert not evaluations.submit("late")
+    stats = evaluations.to_dict()
+    assert (stats['completed'], stats['failed'], stats['dropped']) == (1, 1, 1)
+    assert handler.jobs == ["good"]
+
+def test_concurrent_submit_and_close_never_strand_a_job():
+    for _ in range(20):
+        handler = GatedHandler()
+        handler.release.set()
+        evaluations = EvaluationQueue(handler, max_size=4, policy='block', workers=2)
+        submitters = [threading.Thread(target=evaluations.submit, args=(i,)) for i in range(8)]
+        for submitter in submitters:
+            submitter.start()
+        evaluations.close(timeout=5)
+        for submitter in submitters:
+            submitter.join(5)
+        stats = evaluations.to_dict()
+        assert stats['queued'] + stats['dropped'] == 8
+        assert stats['completed'] == stats['queued'] and stats['depth'] == 0
+
+def test_sampling_respects_rate_and_validates_arguments():
+    evaluations = EvaluationQueue(lambda job: None, sample_rate=0.0)
+    assert not any(evaluations.sample() for _ in range(20))
+    evaluations.close()
+    with pytest.raises(ValueError):
+        EvaluationQueue(lambda job: None, sample_rate=1.5)
+    with pytest.raises(ValueError):
+        EvaluationQueue(lambda job: None, policy='spill')
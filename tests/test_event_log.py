@@ -0,0 +1,67 @@
+import json
+import pytest
+from utils import event_log
+from utils.event_log import EventLog, RunningStat, SessionAggregates
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    calls = []
+    monkeypatch.setattr(event_log.os, "fsync", calls.append)
+    return calls
+
+def _read(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+def test_every_append_is_flushed_but_fsync_is_batched(tmp_path, fsyncs):
+    path = tmp_path / "events.jsonl"
+    log = EventLog(str(path), flush_every=3, fsync_interval=3600)
+    log.append({'event': "a"})
+    log.append({'event': "b"})
+    assert [event['event'] for event in _read(path)] == ["a", "b"]
+    assert fsyncs == []
+    log.append({'event': "c"})
+    assert len(fsyncs) == 1
+    log.append({'event': "d"})
+    log.close()
+    assert len(fsyncs) == 2
+    log.append({'event': "after close"})
+    assert len(_read(path)) == 4
+
+def test_fsync_interval_forces_a_sync(tmp_path, fsyncs):
+    log = EventLog(str(tmp_path / "events.jsonl"), flush_every=100, fsync_interval=0)
+    log.append({'event': "a"})
+    assert len(fsyncs) == 1
+    log.flush()
+    assert len(fsyncs) == 1  # nothing pending
+    log.close()
+
+def test_running_stat_ignores_missing_values():
+    stat = RunningStat()
+    assert stat.to_dict() == {'count': 0, 'min': None, 'max': None, 'mean': None}
+    for value in (4.0, None, 1.0, 7.0):
+        stat.add(value)
+    assert stat.to_dict() == {'count': 3, 'min': 1.0, 'max': 7.0, 'mean': 4.0}
+
+def _summary(harmful=False, executed=True, hallucinated=False, format_valid=True):
+    return {'stage1': {'harmful_content': harmful}, 'stage2': {'execution_successful': executed},
+            'stage3': {'hallucination_detected': hallucinated}, 'stage4': {'format_valid': format_valid}}
+
+def test_session_aggregates_fold_interactions_and_late_evaluations():
+    aggregates = SessionAggregates()
+    aggregates.update({'status': "ok", 'response_time': 2.0, 'time_to_first_token': 0.5,
+                       'evaluation_summary': _summary(), 'overall_score': 8})
+    aggregates.update({'status': "blocked", 'response_time': 0.1})
+    aggregates.update({'status': "ok", 'response_time': 3.0, 'time_to_first_token': 1.5})
+    aggregates.add_evaluation({'evaluation_summary': _summary(hallucinated=True, format_valid=False),
+                               'overall_score': 4})
+
+    report = aggregates.to_dict()
+    assert report['status_counts'] == {'ok': 2, 'blocked': 1, 'failed': 0}
+    assert report['evaluated'] == 2
+    assert report['stage_pass_rates'] == {'stage1': 100.0, 'stage2': 100.0, 'stage3': 50.0, 'stage4': 50.0}
+    assert report['quality_score'] == {'count': 2, 'min': 4, 'max': 8, 'mean': 6.0}
+    assert report['response_time']['count'] == 3 and report['response_time']['max'] == 3.0
+    assert report['time_to_first_token']['mean'] == 1.0
+
+def test_pass_rate_without_evaluations_is_none():
+    assert SessionAggregates().pass_rate('stage1') is None
@@ -0,0 +1,32 @@
+from langchain_core.documents import Document
+from utils.hybrid_retriever import BM25Index, reciprocal_rank_fusion
+
+DOCUMENTS = [Document(page_content=text, metadata={'source': 'faq.pdf'}) for text in (
+    "The refund policy allows returns within thirty days.",
+    "Shipping takes five business days for domestic orders.",
+    "Refund requests need the original receipt; refund amounts exclude shipping.",
+    "Our office is closed on public holidays.",
+)]
+
+def test_bm25_ranks_by_term_weight():
+    index = BM25Index(DOCUMENTS)
+    results = index.search("refund receipt", k=3)
+    assert [doc for doc, _ in results][:2] == [2, 0]
+    assert all(score > 0 for _, score in results)
+    assert results == sorted(results, key=lambda item: item[1], reverse=True)
+
+def test_bm25_ignores_unknown_terms_and_limits_k():
+    index = BM25Index(DOCUMENTS)
+    assert index.search("nonexistent words", k=5) == []
+    assert len(index.search("refund shipping", k=1)) == 1
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    a, b, c = (Document(page_content=text, metadata={'source': 'doc.pdf'}) for text in ("alpha", "beta", "gamma"))
+    fused = reciprocal_rank_fusion([[a, b, c], [b, c, a], [b, a]])
+    assert [doc.page_content for doc in fused] == ["beta", "alpha", "gamma"]
+
+def test_reciprocal_rank_fusion_dedupes_equal_documents():
+    first = Document(page_content="same text", metadata={'source': 'doc.pdf'})
+    copy = Document(page_content="same text", metadata={'source': 'doc.pdf'})
+    fused = reciprocal_rank_fusion([[first], [copy]])
+    assert len(fused) == 1 and fused[0] is first
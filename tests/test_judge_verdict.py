@@ -0,0 +1,27 @@
+from comprehensive_evaluation import format_score, parse_judge_verdict
+
+EMPTY = {'hallucination': None, 'quality_score': None, 'rationale': None}
+
+def test_plain_json_verdict():
+    assert parse_judge_verdict('{"hallucination": false, "quality_score": 8, "rationale": "grounded"}') == {
+        'hallucination': False, 'quality_score': 8, 'rationale': "grounded"}
+
+def test_fenced_json_with_surrounding_prose():
+    text = 'Here is my verdict:\n```json\n{"hallucination": true, "quality_score": 3, "rationale": "made up"}\n```\nDone.'
+    assert parse_judge_verdict(text) == {'hallucination': True, 'quality_score': 3, 'rationale': "made up"}
+
+def test_malformed_json_yields_no_verdict():
+    assert parse_judge_verdict("no json here") == EMPTY
+    assert parse_judge_verdict('{"hallucination": false, "quality_score": 8,}') == EMPTY
+    assert parse_judge_verdict('{"hallucination": false, "quality_score": 8') == EMPTY
+
+def test_partial_or_invalid_fields_come_back_as_none():
+    assert parse_judge_verdict('{"quality_score": 7}') == {'hallucination': None, 'quality_score': 7, 'rationale': None}
+    verdict = parse_judge_verdict('{"hallucination": "no", "quality_score": 11, "rationale": 5}')
+    assert verdict == EMPTY
+    assert parse_judge_verdict('{"hallucination": true, "quality_score": true}')['quality_score'] is None
+    assert parse_judge_verdict('{"quality_score": 7.5}')['quality_score'] is None
+
+def test_missing_score_renders_as_not_available():
+    assert format_score(None) == 'N/A'
+    assert format_score(6) == '6'
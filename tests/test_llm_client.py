@@ -0,0 +1,63 @@
+import threading
+import pytest
+from langchain_core.messages import HumanMessage
+from utils.fakes import FakeChatModel
+from utils.llm_client import LLMClient
+
+def _client(**kwargs):
+    kwargs.setdefault('base_delay', 0.0)
+    return LLMClient(**kwargs)
+
+def test_retries_quota_errors():
+    client = _client(model=FakeChatModel(fail_every=2), max_retries=2)
+    answers = [client.invoke(f"question {i}").content for i in range(4)]
+    assert all(answers)
+    stats = client.stats
+    # Upstream calls 2, 4 and 6 fail and are each retried once
+    assert stats['retries'] == 3 and stats['failures'] == 0
+    assert stats['calls'] == 7
+
+def test_gives_up_after_max_retries():
+    client = _client(model=FakeChatModel(fail_every=1), max_retries=2)
+    with pytest.raises(RuntimeError, match="429"):
+        client.invoke("question")
+    assert client.stats['calls'] == 3
+    assert client.stats['retries'] == 2 and client.stats['failures'] == 1
+
+def test_concurrent_identical_prompts_share_one_call():
+    client = _client(model=FakeChatModel(latency=0.2))
+    barrier = threading.Barrier(5)
+    answers = []
+
+    def ask():
+        barrier.wait()
+        answers.append(client.invoke([HumanMessage(content="same question")]).content)
+
+    threads = [threading.Thread(target=ask) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(answers)) == 1 and len(answers) == 5
+    assert client.stats['calls'] == 1 and client.stats['coalesced'] == 4
+
+def test_coalescing_can_be_disabled():
+    client = _client(model=FakeChatModel(latency=0.05), coalesce=False)
+    threads = [threading.Thread(target=client.invoke, args=("same question",)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.stats['calls'] == 3 and client.stats['coalesced'] == 0
+
+def test_stream_retries_before_first_token():
+    client = _client(model=FakeChatModel(fail_every=2), max_retries=1)
+    client.invoke("warm up")  # the next upstream call fails
+    text = "".join(chunk.content for chunk in client.stream("please repeat these words"))
+    assert text == FakeChatModel().invoke("please repeat these words").content
+    assert client.stats['retries'] == 1
+
+def test_token_budget_is_charged():
+    client = _client(model=FakeChatModel(), tokens_per_minute=600)
+    client.invoke("short prompt")
+    assert client._token_bucket._tokens < client._token_bucket.capacity
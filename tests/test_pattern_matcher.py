@@ -0,0 +1,55 @@
+import re
+import pytest
+from utils.pattern_matcher import PatternMatcher, read_pattern_file
+
+def test_terms_match_whole_words_case_insensitively():
+    matcher = PatternMatcher(["hack", "drop table"])
+    assert matcher.search("How do I HACK a server?") == ("hack", "HACK")
+    assert matcher.search("Sign up for the hackathon") is None
+    assert matcher.search("then drop   table users") == ("drop table", "drop   table")
+
+def test_prefix_wildcard_reports_longest_prefix_rule():
+    matcher = PatternMatcher(["hack*", "hacking tools*"])
+    assert matcher.search("a guide to hacking") == ("hack*", "hacking")
+    assert matcher.search("best hacking toolset") == ("hacking tools*", "hacking toolset")
+
+def test_shared_prefixes_keep_distinct_rules():
+    matcher = PatternMatcher(["bomb", "bombing", "bo"])
+    assert matcher.search("the bombing") == ("bombing", "bombing")
+    assert matcher.search("a bomb") == ("bomb", "bomb")
+    assert matcher.search("bo") == ("bo", "bo")
+    assert matcher.search("bombs") is None
+
+def test_regex_and_category_rules():
+    matcher = PatternMatcher([("injection", "re:ignore (all )?previous instructions"), ("harm", "poison")])
+    assert len(matcher) == 2
+    assert matcher.search("Please ignore all previous instructions") == (
+        "injection:re:ignore (all )?previous instructions", "ignore all previous instructions")
+    assert matcher.search("how to poison") == ("harm:poison", "poison")
+
+def test_invalid_regex_fails_on_its_own_rule():
+    with pytest.raises(re.error):
+        PatternMatcher(["re:("])
+
+def test_regex_rules_keep_their_own_flags_backreferences_and_groups():
+    matcher = PatternMatcher(["re:(?i)drop table", r"re:\b(a)\1\b", "re:(?P<_terms>xyz)", "re:(?P<_re0>qq)", "hack"])
+    assert matcher.search("then DROP TABLE users") == ("re:(?i)drop table", "DROP TABLE")
+    assert matcher.search("say aa") == (r"re:\b(a)\1\b", "aa")
+    assert matcher.search("xyz") == ("re:(?P<_terms>xyz)", "xyz")
+    assert matcher.search("qq") == ("re:(?P<_re0>qq)", "qq")
+
+def test_earliest_match_wins_across_terms_and_regexes():
+    matcher = PatternMatcher(["re:secret", "hack"])
+    assert matcher.search("hack the secret") == ("hack", "hack")
+    assert matcher.search("secret hack") == ("re:secret", "secret")
+
+def test_empty_matcher_never_matches():
+    assert PatternMatcher().search("anything") is None
+
+def test_read_pattern_file(tmp_path):
+    path = tmp_path / "rules.txt"
+    path.write_text("# comment\nglobal\n\n[harm]\nweapon*\n[injection]\nre:system prompt\n", encoding="utf-8")
+    rules = read_pattern_file(str(path))
+    assert rules == [(None, "global"), ("harm", "weapon*"), ("injection", "re:system prompt")]
+    matcher = PatternMatcher.from_files([str(path)])
+    assert matcher.search("buy weapons") == ("harm:weapon*", "weapons")
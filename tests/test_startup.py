@@ -0,0 +1,65 @@
+import threading
+import time
+import pytest
+from utils.startup import ComponentRegistry
+
+def test_failed_build_is_retried_by_the_next_get():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("embeddings unavailable")
+        return "index"
+
+    registry = ComponentRegistry()
+    registry.register('index', flaky)
+    with pytest.raises(RuntimeError, match="unavailable"):
+        registry.get('index')
+    assert not registry.is_ready('index')
+    assert registry.get('index') == "index"
+    assert registry.is_ready('index') and len(attempts) == 2
+
+def test_dependencies_build_first_and_only_once():
+    built = []
+    registry = ComponentRegistry()
+    registry.register('index', lambda: built.append('index') or 'index')
+    registry.register('retriever', lambda: built.append('retriever') or 'retriever', depends=('index',))
+    registry.register('chain', lambda: built.append('chain') or 'chain', depends=('index', 'retriever'))
+    assert registry.get('chain') == 'chain'
+    registry.build_all()
+    assert built == ['index', 'retriever', 'chain']
+
+def test_concurrent_callers_share_one_build():
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return object()
+
+    registry = ComponentRegistry()
+    registry.register('llm', slow)
+    values = []
+    threads = [threading.Thread(target=lambda: values.append(registry.get('llm'))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1 and len({id(value) for value in values}) == 1
+
+def test_failed_warm_up_is_retried_on_demand():
+    failures = iter([RuntimeError("quota"), None])
+
+    def build():
+        error = next(failures)
+        if error is not None:
+            raise error
+        return "gate"
+
+    registry = ComponentRegistry()
+    registry.register('gate', build)
+    registry.warm_up().join()
+    assert not registry.is_ready('gate')
+    assert registry.timings()['gate'] is not None
+    assert registry.get('gate') == "gate"
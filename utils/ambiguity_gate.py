@@ -0,0 +1,54 @@
+from typing import Iterable, Optional, Tuple
+from langchain_core.documents import Document
+from utils.terms import STOPWORDS, tokenize
+
+# Words that only make sense with context the question does not carry
+REFERRING_WORDS = frozenset(
+    "it its this that these those they them their he she him her his one ones there here "
+    "thing things stuff something anything".split()
+)
+
+def document_vocabulary(documents: Iterable[Document]) -> frozenset:
+    return frozenset(term for doc in documents for term in tokenize(doc.page_content))
+
+class AmbiguityGate:
+    """Local first pass for the stage 1 ambiguity check.
+
+    Returns a verdict only when the question is clearly specific (few referring words, and
+    content words that are mostly in the documents' vocabulary, or at least
+    ``min_content_words`` of them when no vocabulary is available) or clearly ambiguous
+    (nothing but referring words and stopwords); everything in between is left to the LLM judge.
+    """
+
+    def __init__(self, vocabulary: Optional[Iterable[str]] = None, min_content_words: int = 2,
+                 max_referring_ratio: float = 0.2, min_vocabulary_overlap: float = 0.5):
+        self.vocabulary = frozenset(vocabulary) if vocabulary is not None else None
+        self.min_content_words = min_content_words
+        self.max_referring_ratio = max_referring_ratio
+        self.min_vocabulary_overlap = min_vocabulary_overlap
+
+    def classify(self, question: str) -> Tuple[Optional[bool], str]:
+        """(is_ambiguous, reason); is_ambiguous is None when the LLM judge should decide"""
+        terms = tokenize(question)
+        if not terms:
+            return True, "no words"
+        referring = sum(1 for term in terms if term in REFERRING_WORDS)
+        content = [term for term in terms if term not in STOPWORDS and term not in REFERRING_WORDS]
+        referring_ratio = referring / len(terms)
+
+        if not content:
+            return True, "only referring words and stopwords"
+        if referring_ratio > self.max_referring_ratio:
+            return None, f"{referring_ratio:.0%} referring words"
+        if self.vocabulary is None:
+            if len(content) < self.min_content_words:
+                return None, f"{len(content)} content words"
+            return False, "specific"
+        # A short question is still specific when it names something the documents cover
+        overlap = sum(1 for term in content if self._known(term)) / len(content)
+        if overlap < self.min_vocabulary_overlap:
+            return None, f"{overlap:.0%} of content words appear in the documents"
+        return False, "specific"
+
+    def _known(self, term: str) -> bool:
+        return term in self.vocabulary or (term.endswith("s") and term[:-1] in self.vocabulary)
@@ -0,0 +1,107 @@
+import math
+from typing import Optional
+import numpy as np
+from utils.numpy_index import _top_k
+
+ASSIGN_BLOCK_ROWS = 8192
+
+class IVFIndex:
+    """Inverted-file ANN index over L2-normalized vectors (cosine similarity).
+
+    Vectors are bucketed by their nearest k-means centroid; a query scans only the
+    ``nprobe`` closest buckets. ``nlist`` and ``nprobe`` trade recall for latency:
+    more buckets make each scan smaller, more probes raise recall. The index stores
+    only centroids and one bucket id per row, so it sits alongside the vector matrix.
+    """
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = 8, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.seed = seed
+        self.centroids = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.trained_size = 0
+        self._lists = None
+
+    @staticmethod
+    def default_nlist(row_count: int) -> int:
+        return max(1, int(4 * math.sqrt(row_count)))
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def needs_training(self, row_count: int) -> bool:
+        """Retrain once the corpus has grown well past what the centroids were fitted on"""
+        return not self.is_trained or row_count > 4 * max(1, self.trained_size)
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + ASSIGN_BLOCK_ROWS])
+            assignments[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        return assignments
+
+    def train(self, matrix: np.ndarray, iterations: int = 10, sample_size: int = 65536):
+        """Spherical k-means on a sample of the rows, then bucket every row"""
+        rng = np.random.default_rng(self.seed)
+        row_count = len(matrix)
+        nlist = min(self.nlist or self.default_nlist(row_count), row_count)
+        sample_rows = rng.choice(row_count, size=min(row_count, max(sample_size, nlist)), replace=False)
+        sample = np.asarray(matrix[np.sort(sample_rows)], dtype=np.float32)
+
+        self.centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = self._assign(sample)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                # Reseed empty buckets from random sample rows
+                sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.centroids = (sums / norms).astype(np.float32)
+
+        self.nlist = nlist
+        self.assignments = self._assign(matrix)
+        self.trained_size = row_count
+        self._lists = None
+
+    def add(self, vectors: np.ndarray):
+        """Bucket newly appended rows without retraining"""
+        self.assignments = np.concatenate([self.assignments, self._assign(vectors)])
+        self._lists = None
+
+    def keep_rows(self, keep):
+        """Mirror a row deletion in the vector matrix"""
+        self.assignments = self.assignments[keep]
+        self._lists = None
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind='stable')
+            bounds = np.cumsum(np.bincount(self.assignments, minlength=self.nlist))[:-1]
+            self._lists = np.split(order, bounds)
+        return self._lists
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Row positions in the nprobe buckets closest to the (normalized) query"""
+        probes = _top_k(self.centroids @ query, nprobe or self.nprobe)
+        lists = self._inverted_lists()
+        return np.concatenate([lists[bucket] for bucket in probes])
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            np.savez(f, centroids=self.centroids, assignments=self.assignments,
+                     trained_size=self.trained_size, nprobe=self.nprobe)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path) as data:
+            index = cls(nlist=len(data['centroids']), nprobe=int(data['nprobe']))
+            index.centroids = data['centroids']
+            index.assignments = data['assignments']
+            index.trained_size = int(data['trained_size'])
+        return index
@@ -0,0 +1,176 @@
+import atexit
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ANSWER_CACHE_PATH = ".answer_cache.json"
+# Minimum seconds between two rewrites of the cache file; pending changes are saved on close
+SAVE_INTERVAL = 5.0
+
+logger = logging.getLogger(__name__)
+
+def normalize_query(text: str) -> str:
+    """Case-fold, drop punctuation and collapse whitespace so trivial rewordings share a key"""
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+class AnswerCache:
+    """LRU + TTL answer cache keyed by normalized query text, persisted to a JSON file.
+
+    When ``embed_fn`` is given, a miss on the exact key falls back to the most similar
+    cached query whose cosine similarity reaches ``similarity_threshold``. All entries
+    are tied to ``index_version`` and dropped as soon as the index changes. The file is
+    rewritten at most every ``save_interval`` seconds and once more on ``close``.
+    """
+
+    def __init__(self, path: Optional[str] = ANSWER_CACHE_PATH, index_version: Optional[str] = None,
+                 max_entries: int = 512, ttl_seconds: Optional[float] = 24 * 3600,
+                 embed_fn: Optional[Callable[[str], List[float]]] = None,
+                 similarity_threshold: float = 0.95, save_interval: float = SAVE_INTERVAL):
+        self.path = path
+        self.index_version = index_version
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.save_interval = save_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self.stats = {'hits': 0, 'semantic_hits': 0, 'misses': 0, 'evictions': 0}
+        self.load()
+        atexit.register(self.close)
+
+    def _expired(self, record: Dict[str, Any], now: float) -> bool:
+        return self.ttl_seconds is not None and now - record['created_at'] > self.ttl_seconds
+
+    def _evict(self):
+        now = time.time()
+        for key in [k for k, record in self._entries.items() if self._expired(record, now)]:
+            del self._entries[key]
+            self.stats['evictions'] += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        return self.lookup(query)[0]
+
+    def lookup(self, query: str) -> Tuple[Optional[Dict[str, Any]], Optional[List[float]]]:
+        """Return the cached value (or None) and the query embedding if one was computed.
+
+        Pass the embedding on to ``put`` so a miss does not embed the same query twice.
+        """
+        key = normalize_query(query)
+        with self._lock:
+            record = self._entries.get(key)
+            if record is not None and self._expired(record, time.time()):
+                del self._entries[key]
+                self.stats['evictions'] += 1
+                record = None
+            if record is not None:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return record['value'], None
+            has_embeddings = self.embed_fn is not None and any(r.get('embedding') for r in self._entries.values())
+
+        query_vector = None
+        if has_embeddings:
+            query_vector = self.embed_fn(query)
+            with self._lock:
+                now = time.time()
+                best_key, best_score = None, self.similarity_threshold
+                for candidate_key, candidate in self._entries.items():
+                    if candidate.get('embedding') and not self._expired(candidate, now):
+                        score = _cosine(query_vector, candidate['embedding'])
+                        if score >= best_score:
+                            best_key, best_score = candidate_key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.stats['hits'] += 1
+                    self.stats['semantic_hits'] += 1
+                    return self._entries[best_key]['value'], query_vector
+
+        with self._lock:
+            self.stats['misses'] += 1
+        return None, query_vector
+
+    def put(self, query: str, value: Dict[str, Any], embedding: Optional[List[float]] = None):
+        if embedding is None and self.embed_fn is not None:
+            embedding = self.embed_fn(query)
+        with self._lock:
+            key = normalize_query(query)
+            self._entries[key] = {
+                'query': query,
+                'value': value,
+                'created_at': time.time(),
+                'embedding': embedding
+            }
+            self._entries.move_to_end(key)
+            self._evict()
+            self._dirty = True
+            due = time.monotonic() - self._last_save >= self.save_interval
+        if due:
+            self.save()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if payload.get('index_version') != self.index_version:
+            # Answers were produced against a different index, so none of them can be trusted
+            return
+        with self._lock:
+            self._entries = OrderedDict(payload.get('entries', []))
+            self._evict()
+
+    def save(self) -> bool:
+        """Atomically rewrite the cache file; a failure is logged, never raised"""
+        if not self.path:
+            return False
+        with self._save_lock:
+            with self._lock:
+                payload = {'index_version': self.index_version, 'entries': list(self._entries.items())}
+                self._dirty = False
+                self._last_save = time.monotonic()
+            tmp_path = None
+            try:
+                fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".",
+                                                suffix=".tmp", dir=os.path.dirname(self.path) or ".")
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(payload, f)
+                os.replace(tmp_path, self.path)
+                return True
+            except Exception as e:
+                logger.error(f"Failed to save answer cache to {self.path}: {e}")
+                if tmp_path is not None and os.path.exists(tmp_path):
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+                with self._lock:
+                    self._dirty = True
+                return False
+
+    def close(self):
+        """Save changes not yet written by the debounced ``put``"""
+        if self._dirty:
+            self.save()
@@ -0,0 +1,157 @@
+import math
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+from langchain_core.documents import Document
+from utils.terms import STOPWORDS, tokenize
+from utils.loader import CHUNK_OVERLAP
+from utils.memory import estimate_tokens
+
+SHINGLE_SIZE = 3
+# A trimmed chunk shorter than this is not worth the prompt space
+MIN_TRIMMED_TOKENS = 40
+
+def _shingles(text: str) -> frozenset:
+    terms = tokenize(text)
+    if len(terms) < SHINGLE_SIZE:
+        return frozenset([tuple(terms)])
+    return frozenset(tuple(terms[i:i + SHINGLE_SIZE]) for i in range(len(terms) - SHINGLE_SIZE + 1))
+
+def _term_vector(text: str) -> Counter:
+    return Counter(term for term in tokenize(text) if term not in STOPWORDS)
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[term] for term, count in a.items() if term in b)
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+def _text_overlap(left: str, right: str, max_overlap: int) -> int:
+    """Length of the longest suffix of ``left`` that is a prefix of ``right`` (bounded search)"""
+    probe = right[:min(32, len(right))]
+    if not probe:
+        return 0
+    window_start = max(0, len(left) - max_overlap - len(probe))
+    position = left.find(probe, window_start)
+    while position != -1:
+        tail = left[position:]
+        if right.startswith(tail):
+            return len(tail)
+        position = left.find(probe, position + 1)
+    return 0
+
+class ContextPacker:
+    """Assembles retrieved chunks into a compact prompt context.
+
+    In order: chunks from the same source that overlap (the splitter repeats
+    ``chunk_overlap`` characters between neighbours) are merged into one passage,
+    near-duplicates (at least ``dedupe_threshold`` of the smaller one's word shingles
+    already present in a higher-ranked passage) are dropped, the
+    remainder is optionally re-ranked by maximal marginal relevance on local term vectors
+    (``mmr_lambda``; 1.0 is pure relevance), and passages are added in rank order until
+    ``max_tokens`` is reached, trimming the last one at a sentence boundary. The budget
+    must fit at least a trimmed passage, so the top passage is always kept.
+    """
+
+    def __init__(self, max_tokens: int = 1500, dedupe_threshold: float = 0.8,
+                 mmr_lambda: Optional[float] = None, max_overlap: int = CHUNK_OVERLAP):
+        if max_tokens < MIN_TRIMMED_TOKENS:
+            raise ValueError(f"max_tokens must be at least {MIN_TRIMMED_TOKENS}, got {max_tokens}")
+        self.max_tokens = max_tokens
+        self.dedupe_threshold = dedupe_threshold
+        self.mmr_lambda = mmr_lambda
+        self.max_overlap = max_overlap
+
+    def _merge_adjacent(self, documents: List[Document]) -> List[Document]:
+        """Merge overlapping chunks of one source; a merged passage keeps its best rank"""
+        while True:
+            merged = self._merge_pass(documents)
+            # A merged passage can bridge two earlier passages, so repeat until nothing joins
+            if len(merged) == len(documents):
+                return merged
+            documents = merged
+
+    def _merge_pass(self, documents: List[Document]) -> List[Document]:
+        merged: List[Document] = []
+        for doc in documents:
+            for index, kept in enumerate(merged):
+                if kept.metadata.get('source') != doc.metadata.get('source'):
+                    continue
+                if doc.page_content in kept.page_content:
+                    break  # already covered by a merged passage
+                combined = self._join(kept, doc) or self._join(doc, kept)
+                if combined is not None:
+                    merged[index] = combined
+                    break
+            else:
+                merged.append(Document(page_content=doc.page_content, metadata=dict(doc.metadata)))
+        return merged
+
+    def _join(self, first: Document, second: Document) -> Optional[Document]:
+        """``first`` followed by ``second`` when they overlap or touch in the source text"""
+        first_start, second_start = first.metadata.get('start_index'), second.metadata.get('start_index')
+        if first_start is not None and second_start is not None:
+            first_end = first_start + len(first.page_content)
+            if not first_start <= second_start <= first_end:
+                return None
+            text = first.page_content + second.page_content[first_end - second_start:]
+        else:
+            overlap = _text_overlap(first.page_content, second.page_content, self.max_overlap)
+            if overlap == 0:
+                return None
+            text = first.page_content + second.page_content[overlap:]
+        metadata = dict(first.metadata)
+        metadata['merged_chunks'] = first.metadata.get('merged_chunks', 1) + second.metadata.get('merged_chunks', 1)
+        return Document(page_content=text, metadata=metadata)
+
+    def _dedupe(self, documents: List[Document]) -> List[Document]:
+        kept, kept_shingles = [], []
+        for doc in documents:
+            shingles = _shingles(doc.page_content)
+            # Overlap coefficient, so a chunk mostly repeated inside a longer passage also counts
+            if any(len(shingles & other) / min(len(shingles), len(other)) >= self.dedupe_threshold
+                   for other in kept_shingles):
+                continue
+            kept.append(doc)
+            kept_shingles.append(shingles)
+        return kept
+
+    def _mmr(self, query: str, documents: List[Document]) -> List[Document]:
+        query_vector = _term_vector(query)
+        vectors = [_term_vector(doc.page_content) for doc in documents]
+        # Retriever rank counts as relevance too, so lexically sparse matches are not buried
+        relevance = [0.5 * _cosine(query_vector, vector) + 0.5 / (rank + 1) for rank, vector in enumerate(vectors)]
+        selected, remaining = [], list(range(len(documents)))
+        while remaining:
+            def score(i):
+                redundancy = max((_cosine(vectors[i], vectors[j]) for j in selected), default=0.0)
+                return self.mmr_lambda * relevance[i] - (1 - self.mmr_lambda) * redundancy
+            best = max(remaining, key=score)
+            selected.append(best)
+            remaining.remove(best)
+        return [documents[i] for i in selected]
+
+    def _trim(self, documents: List[Document]) -> List[Document]:
+        packed, budget = [], self.max_tokens
+        for doc in documents:
+            tokens = estimate_tokens(doc.page_content)
+            if tokens <= budget:
+                packed.append(doc)
+                budget -= tokens
+                continue
+            if budget >= MIN_TRIMMED_TOKENS:
+                text = doc.page_content[:budget * 4]
+                cut = max(text.rfind('. '), text.rfind('\n'))
+                text = text[:cut + 1] if cut > len(text) // 2 else text.rsplit(' ', 1)[0]
+                packed.append(Document(page_content=text, metadata=dict(doc.metadata, truncated=True)))
+            break
+        return packed
+
+    def pack(self, documents: Sequence[Document], query: str = "") -> List[Document]:
+        packed = self._dedupe(self._merge_adjacent(list(documents)))
+        if self.mmr_lambda is not None and len(packed) > 1:
+            packed = self._mmr(query, packed)
+        return self._trim(packed)
+
+    @staticmethod
+    def measure(documents: Sequence[Document]) -> Dict[str, int]:
+        return {'chunks': len(documents), 'tokens': sum(estimate_tokens(doc.page_content) for doc in documents)}
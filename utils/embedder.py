@@ -1,7 +1,196 @@
-from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+import hashlib
+import json
+import logging
+import os
+from utils.loader import CHUNK_SIZE, CHUNK_OVERLAP, INGEST_BATCH_SIZE, expand_sources, iter_chunk_batches
+from utils.startup import timed_import
 
-def create_vector_store(documents):
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    db = Chroma.from_documents(documents, embedding=embeddings)
+EMBEDDING_MODEL = "models/embedding-001"
+PERSIST_DIRECTORY = ".vector_store"
+COLLECTION_PREFIX = "doc_"
+NUMPY_PREFIX = "numpy_"
+
+logger = logging.getLogger(__name__)
+
+def embedding_identity(embeddings=None):
+    """Identity of an embedding model for the index keys: class, model name and dimension.
+
+    None stands for the default Gemini embeddings and maps to EMBEDDING_MODEL, so existing
+    stores keep their keys.
+    """
+    if embeddings is None:
+        return EMBEDDING_MODEL
+    base = getattr(embeddings, 'base', embeddings)  # look through BatchedEmbeddings
+    parts = [f"{type(base).__module__}.{type(base).__qualname__}"]
+    for attribute in ('model', 'model_name', 'dimension', 'dimensions', 'output_dimensionality'):
+        value = getattr(base, attribute, None)
+        if value is not None:
+            parts.append(f"{attribute}={value}")
+    return ";".join(parts)
+
+def _settings_payload(chunk_size, chunk_overlap, model):
+    settings = {'chunk_size': chunk_size, 'chunk_overlap': chunk_overlap, 'model': model}
+    return json.dumps(settings, sort_keys=True).encode('utf-8')
+
+def compute_index_key(source_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, model=EMBEDDING_MODEL):
+    """Hash the source file, splitter settings and embedding model into a stable index key"""
+    digest = hashlib.sha256()
+    with open(source_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(_settings_payload(chunk_size, chunk_overlap, model))
+    return digest.hexdigest()[:32]
+
+def compute_sources_key(sources, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, model=EMBEDDING_MODEL):
+    """Index key for a multi-file corpus from each file's path, size and mtime (no full read)"""
+    digest = hashlib.sha256()
+    for file_path in expand_sources(sources):
+        stat = os.stat(file_path)
+        digest.update(f"{os.path.abspath(file_path)}\x00{stat.st_size}\x00{stat.st_mtime_ns}\n".encode('utf-8'))
+    digest.update(_settings_payload(chunk_size, chunk_overlap, model))
+    return digest.hexdigest()[:32]
+
+def compute_collection_key(source_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, model=EMBEDDING_MODEL):
+    """Identify the collection for a source path; unlike the index key it survives content edits"""
+    paths = [source_path] if isinstance(source_path, str) else list(source_path)
+    digest = hashlib.sha256("\x00".join(os.path.abspath(path) for path in paths).encode('utf-8'))
+    digest.update(_settings_payload(chunk_size, chunk_overlap, model))
+    return digest.hexdigest()[:32]
+
+def assign_chunk_ids(documents, seen=None):
+    """Fingerprint each chunk by source and content; repeated chunks get an occurrence suffix.
+
+    Pass the same ``seen`` dict across batches so occurrence numbering spans the corpus.
+    """
+    seen = {} if seen is None else seen
+    chunk_ids = []
+    for doc in documents:
+        source = str(doc.metadata.get('source', ''))
+        fingerprint = hashlib.sha256(f"{source}\x00{doc.page_content}".encode('utf-8')).hexdigest()[:32]
+        occurrence = seen.get(fingerprint, 0)
+        seen[fingerprint] = occurrence + 1
+        chunk_id = fingerprint if occurrence == 0 else f"{fingerprint}-{occurrence}"
+        doc.metadata['chunk_id'] = chunk_id
+        chunk_ids.append(chunk_id)
+    return chunk_ids
+
+def sync_vector_store(db, documents):
+    """Embed only new chunks and delete vectors whose chunk no longer exists"""
+    return sync_vector_store_batches(db, [documents])
+
+def sync_vector_store_batches(db, batches):
+    """Incremental sync fed by an iterable of chunk batches; only ids are held for the whole corpus"""
+    stored_ids = set(db.get(include=[])['ids'])
+    wanted_ids = set()
+    seen = {}
+    added = 0
+    for documents in batches:
+        chunk_ids = assign_chunk_ids(documents, seen)
+        wanted_ids.update(chunk_ids)
+        new_docs = []
+        new_ids = []
+        for chunk_id, doc in zip(chunk_ids, documents):
+            if chunk_id not in stored_ids:
+                new_docs.append(doc)
+                new_ids.append(chunk_id)
+        if new_docs:
+            db.add_documents(new_docs, ids=new_ids)
+            added += len(new_ids)
+
+    stale_ids = list(stored_ids - wanted_ids)
+    if stale_ids:
+        db.delete(ids=stale_ids)
+
+    stats = {
+        'added': added,
+        'removed': len(stale_ids),
+        'unchanged': len(wanted_ids & stored_ids)
+    }
+    logger.info(f"Vector store sync: {stats['added']} added, {stats['removed']} removed, {stats['unchanged']} unchanged")
+    return stats
+
+def _manifest_path(persist_directory, collection_name):
+    return os.path.join(persist_directory, f"{collection_name}.json")
+
+def _open_store(backend, collection_name, embeddings, persist_directory):
+    if backend == "numpy":
+        from utils.numpy_index import NumpyVectorStore
+        return NumpyVectorStore.load(os.path.join(persist_directory, collection_name), embeddings)
+    return _chroma()(
+        collection_name=collection_name,
+        embedding_function=embeddings,
+        persist_directory=persist_directory
+    )
+
+def _chroma():
+    # Chroma and the Google client are imported on first use to keep module import fast
+    return timed_import("langchain_community.vectorstores.chroma").Chroma
+
+def _default_embeddings():
+    from utils.embedding_pipeline import BatchedEmbeddings
+    google_genai = timed_import("langchain_google_genai")
+    return BatchedEmbeddings(google_genai.GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL))
+
+def _open_synced_store(backend, collection_key, index_key, sync, persist_directory, ann=None, embeddings=None):
+    """Open the persistent store and run ``sync`` on it only when the index key has changed.
+
+    ``ann`` (numpy backend only) is a dict of IVFIndex settings, e.g. {'nlist': None, 'nprobe': 8}.
+    ``embeddings`` replaces the default batched Gemini embeddings (e.g. with utils.fakes.FakeEmbeddings);
+    the collection and index keys must have been computed with its ``embedding_identity``.
+    """
+    model = embedding_identity(embeddings)
+    embeddings = embeddings or _default_embeddings()
+    os.makedirs(persist_directory, exist_ok=True)
+    prefix = NUMPY_PREFIX if backend == "numpy" else COLLECTION_PREFIX
+    collection_name = f"{prefix}{collection_key}"
+    manifest_path = _manifest_path(persist_directory, collection_name)
+    db = _open_store(backend, collection_name, embeddings, persist_directory)
+
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+    changed = manifest.get('index_key') != index_key
+    if changed:
+        # Changed (or interrupted) index: diff the chunk set instead of re-embedding everything
+        stats = sync(db)
+    retrained = backend == "numpy" and ann is not None and db.enable_ann(**ann)
+    if backend == "numpy" and (changed or retrained):
+        db.save(os.path.join(persist_directory, collection_name))
+    if changed:
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({'index_key': index_key, 'chunk_count': stats['added'] + stats['unchanged'], 'model': model}, f)
+    return db
+
+def create_vector_store(documents, source_path=None, persist_directory=PERSIST_DIRECTORY, backend="chroma", ann=None,
+                        embeddings=None):
+    if source_path is None:
+        embeddings = embeddings or _default_embeddings()
+        if backend == "numpy":
+            from utils.numpy_index import NumpyVectorStore
+            db = NumpyVectorStore.from_documents(documents, embedding=embeddings)
+            if ann is not None:
+                db.enable_ann(**ann)
+        else:
+            db = _chroma().from_documents(documents, embedding=embeddings)
+        return db.as_retriever()
+
+    # One persistent store per source; its content is kept in sync chunk by chunk
+    model = embedding_identity(embeddings)
+    db = _open_synced_store(
+        backend, compute_collection_key(source_path, model=model), compute_index_key(source_path, model=model),
+        lambda store: sync_vector_store(store, documents), persist_directory, ann, embeddings
+    )
+    return db.as_retriever()
+
+def create_vector_store_from_sources(sources, persist_directory=PERSIST_DIRECTORY, batch_size=INGEST_BATCH_SIZE,
+                                     backend="chroma", ann=None, embeddings=None):
+    """Index files, directories or globs by streaming chunk batches straight into the embedding stage"""
+    model = embedding_identity(embeddings)
+    db = _open_synced_store(
+        backend, compute_collection_key(sources, model=model), compute_sources_key(sources, model=model),
+        lambda store: sync_vector_store_batches(store, iter_chunk_batches(sources, batch_size=batch_size)),
+        persist_directory, ann, embeddings
+    )
     return db.as_retriever()
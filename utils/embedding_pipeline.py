@@ -0,0 +1,87 @@
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+from langchain_core.embeddings import Embeddings
+from utils.rate_limit import TokenBucket
+
+EMBED_BATCH_SIZE = 64
+EMBED_MAX_WORKERS = 4
+EMBED_REQUESTS_PER_MINUTE = 300
+EMBED_MAX_RETRIES = 3
+
+logger = logging.getLogger(__name__)
+
+def _embed_batch_with_retry(embed_fn, batch, rate_limiter, max_retries, base_delay):
+    attempt = 0
+    while True:
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            return embed_fn(batch)
+        except Exception as e:
+            if attempt >= max_retries:
+                raise
+            delay = base_delay * (2 ** attempt) * (0.5 + random.random())
+            logger.warning(f"Embedding batch of {len(batch)} failed ({e}); retrying in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+
+def embed_in_batches(texts: List[str], embed_fn: Callable[[List[str]], List[List[float]]],
+                     batch_size: int = EMBED_BATCH_SIZE, max_workers: int = EMBED_MAX_WORKERS,
+                     rate_limiter: Optional[TokenBucket] = None, max_retries: int = EMBED_MAX_RETRIES,
+                     base_delay: float = 1.0):
+    """Embed texts in fixed-size batches across a bounded thread pool, preserving input order.
+
+    ``embed_fn`` is any callable mapping a list of texts to a list of vectors, so a local
+    fake can stand in for the remote embedding client. Returns ``(vectors, stats)``.
+    """
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    start_time = time.time()
+    vectors = []
+    if batches:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as pool:
+            futures = [
+                pool.submit(_embed_batch_with_retry, embed_fn, batch, rate_limiter, max_retries, base_delay)
+                for batch in batches
+            ]
+            for future in futures:
+                vectors.extend(future.result())
+
+    elapsed = time.time() - start_time
+    stats = {
+        'chunks': len(texts),
+        'batches': len(batches),
+        'seconds': elapsed,
+        'chunks_per_second': len(texts) / elapsed if elapsed > 0 else 0.0
+    }
+    if texts:
+        logger.info(f"Embedded {stats['chunks']} chunks in {stats['batches']} batches "
+                    f"({stats['chunks_per_second']:.1f} chunks/sec)")
+    return vectors, stats
+
+class BatchedEmbeddings(Embeddings):
+    """Embeddings wrapper that routes document embedding through the batched pipeline"""
+
+    def __init__(self, base: Embeddings, batch_size: int = EMBED_BATCH_SIZE,
+                 max_workers: int = EMBED_MAX_WORKERS,
+                 requests_per_minute: Optional[float] = EMBED_REQUESTS_PER_MINUTE,
+                 max_retries: int = EMBED_MAX_RETRIES):
+        self.base = base
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.rate_limiter = TokenBucket.per_minute(requests_per_minute, burst=max_workers) if requests_per_minute else None
+        self.last_stats = None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, self.last_stats = embed_in_batches(
+            texts, self.base.embed_documents,
+            batch_size=self.batch_size, max_workers=self.max_workers,
+            rate_limiter=self.rate_limiter, max_retries=self.max_retries
+        )
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.base.embed_query(text)
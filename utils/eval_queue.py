@@ -0,0 +1,98 @@
+import logging
+import queue
+import random
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop', 'block')
+_STOP = object()
+
+class EvaluationQueue:
+    """Bounded queue of deferred jobs drained by background worker threads.
+
+    ``sample`` picks a random ``sample_rate`` fraction of candidates. When the queue is full,
+    ``submit`` drops the job (``policy='drop'``) or makes the caller wait for a free slot
+    (``policy='block'``), which applies backpressure instead of losing the job.
+    """
+
+    def __init__(self, handler: Callable[[Any], None], sample_rate: float = 1.0, max_size: int = 100,
+                 policy: str = 'drop', workers: int = 1, seed: Optional[int] = None):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"sample_rate must be between 0 and 1, got {sample_rate}")
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy!r}; expected one of {OVERFLOW_POLICIES}")
+        self.handler = handler
+        self.sample_rate = sample_rate
+        self.policy = policy
+        self._queue = queue.Queue(maxsize=max(1, max_size))
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # Held across the closed check and the put, so close() cannot slip its stop markers in
+        # between and strand a job behind them; workers never take it, so a blocked put still drains
+        self._submit_lock = threading.Lock()
+        self._closed = False
+        self.stats = {'sampled': 0, 'sampled_out': 0, 'queued': 0, 'dropped': 0, 'completed': 0, 'failed': 0}
+        self._workers = [threading.Thread(target=self._run, name=f"evaluation-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for worker in self._workers:
+            worker.start()
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def sample(self) -> bool:
+        """Decide whether the next candidate is evaluated at all"""
+        with self._lock:
+            sampled = self._random.random() < self.sample_rate
+            self.stats['sampled' if sampled else 'sampled_out'] += 1
+        return sampled
+
+    def submit(self, job: Any) -> bool:
+        """Queue a job; False when it was dropped because the queue is full or closed"""
+        with self._submit_lock:
+            if self._closed:
+                self._count('dropped')
+                return False
+            try:
+                self._queue.put(job, block=self.policy == 'block')
+            except queue.Full:
+                self._count('dropped')
+                return False
+        self._count('queued')
+        return True
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is _STOP:
+                    return
+                self.handler(job)
+                self._count('completed')
+            except Exception as e:
+                self._count('failed')
+                logger.error(f"Deferred evaluation failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def close(self, timeout: Optional[float] = None):
+        """Stop accepting jobs and wait for the workers to finish the ones already queued"""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+        for _ in self._workers:
+            self._queue.put(_STOP)
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, depth=self._queue.qsize(), sample_rate=self.sample_rate, policy=self.policy)
@@ -0,0 +1,133 @@
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+class EventLog:
+    """Append-only JSONL event log with batched fsync.
+
+    Every event is flushed to the OS as soon as it is appended, so a crash of the process
+    never loses it; only the fsync to disk is batched, every ``flush_every`` events or
+    ``fsync_interval`` seconds, whichever comes first, and on close.
+    """
+
+    def __init__(self, path: str, flush_every: int = 16, fsync_interval: float = 2.0):
+        self.path = path
+        self.flush_every = flush_every
+        self.fsync_interval = fsync_interval
+        self._file = open(path, 'a', encoding='utf-8')
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def append(self, event: Dict[str, Any]):
+        line = json.dumps(event, default=str, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(line)
+            self._file.flush()
+            self._pending += 1
+            if self._pending >= self.flush_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            if not self._file.closed and self._pending:
+                self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            if self._pending:
+                self._sync()
+            self._file.close()
+
+class RunningStat:
+    """O(1) running count / min / max / mean"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value: Optional[float]):
+        if value is None:
+            return
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'count': self.count, 'min': self.min, 'max': self.max, 'mean': self.mean}
+
+STAGE_CHECKS = {
+    'stage1': lambda summary: not summary['stage1']['harmful_content'],
+    'stage2': lambda summary: summary['stage2']['execution_successful'],
+    'stage3': lambda summary: not summary['stage3']['hallucination_detected'],
+    'stage4': lambda summary: summary['stage4']['format_valid'],
+}
+
+class SessionAggregates:
+    """Incrementally maintained session statistics, so reports never rescan interactions"""
+
+    def __init__(self):
+        self.status_counts = {'ok': 0, 'blocked': 0, 'failed': 0}
+        self.evaluated = 0
+        self.stage_passes = {stage: 0 for stage in STAGE_CHECKS}
+        self.quality_score = RunningStat()
+        self.response_time = RunningStat()
+        self.time_to_first_token = RunningStat()
+        self._lock = threading.Lock()
+
+    def update(self, event: Dict[str, Any]):
+        status = event.get('status', 'ok')
+        with self._lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            self.response_time.add(event.get('response_time'))
+            self.time_to_first_token.add(event.get('time_to_first_token'))
+            if event.get('evaluation_summary'):
+                self._add_evaluation(event)
+
+    def add_evaluation(self, event: Dict[str, Any]):
+        """Fold in a Stage 1-4 evaluation that finished after its interaction was recorded"""
+        with self._lock:
+            self._add_evaluation(event)
+
+    def _add_evaluation(self, event: Dict[str, Any]):
+        summary = event['evaluation_summary']
+        self.evaluated += 1
+        for stage, passed in STAGE_CHECKS.items():
+            if passed(summary):
+                self.stage_passes[stage] += 1
+        self.quality_score.add(event.get('overall_score'))
+
+    def pass_rate(self, stage: str) -> Optional[float]:
+        return self.stage_passes[stage] / self.evaluated * 100 if self.evaluated else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'status_counts': dict(self.status_counts),
+                'evaluated': self.evaluated,
+                'stage_pass_rates': {stage: self.pass_rate(stage) for stage in STAGE_CHECKS},
+                'quality_score': self.quality_score.to_dict(),
+                'response_time': self.response_time.to_dict(),
+                'time_to_first_token': self.time_to_first_token.to_dict()
+            }
@@ -0,0 +1,139 @@
+"""Deterministic local stand-ins for the Gemini chat model and embeddings.
+
+They keep the pipeline runnable offline (benchmarks, smoke runs): answers and judge
+verdicts are derived from the prompt text, embeddings from hashed word counts, and
+both sleep for a configurable time to simulate API latency.
+"""
+import hashlib
+import re
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+from utils.memory import estimate_tokens
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def _stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+class FakeEmbeddings(Embeddings):
+    """Hashed bag-of-words vectors: texts sharing words get similar embeddings.
+
+    Each call sleeps ``latency + per_text_latency * len(texts)`` seconds.
+    """
+
+    def __init__(self, dimension: int = 256, latency: float = 0.0, per_text_latency: float = 0.0):
+        self.dimension = dimension
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in WORD_PATTERN.findall(text.lower()):
+            hashed = _stable_hash(word)
+            vector[hashed % self.dimension] += 1.0 if (hashed >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            vector[_stable_hash(text) % self.dimension] = 1.0
+            norm = 1.0
+        return (vector / norm).tolist()
+
+    def _sleep(self, count: int):
+        delay = self.latency + self.per_text_latency * count
+        if delay > 0:
+            time.sleep(delay)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._sleep(len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._sleep(1)
+        return self._vector(text)
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers the evaluator's prompts without a network call.
+
+    The RAG prompt is answered with the first sentences of its context, the judges get
+    fixed-format verdicts (quality scores vary deterministically with the prompt), and
+    anything else is echoed back in short form. Each call waits ``latency`` seconds;
+    streamed calls additionally wait ``token_latency`` per token. With ``fail_every=n``
+    every n-th call raises a quota error, to exercise retry handling.
+    """
+
+    latency: float = 0.0
+    token_latency: float = 0.0
+    answer_sentences: int = 2
+    fail_every: int = 0
+
+    _calls: int = PrivateAttr(default=0)
+    _calls_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _respond(self, prompt: str) -> str:
+        lowered = prompt.lower()
+        score = 6 + _stable_hash(prompt) % 4
+        if '"quality_score"' in prompt:
+            return f'{{"hallucination": false, "quality_score": {score}, "rationale": "Consistent with the context."}}'
+        if "ambiguous or unclear" in lowered or "hallucinated or fabricated" in lowered:
+            return "No"
+        if "scale of 1-10" in lowered:
+            return str(score)
+        context = re.search(r"<context>(.*?)</context>", prompt, re.DOTALL)
+        if context:
+            sentences = re.split(r"(?<=[.!?])\s+", " ".join(context.group(1).split()))
+            return " ".join(sentences[:self.answer_sentences]) or "The context does not cover this."
+        return " ".join(prompt.split()[-40:])
+
+    def _start_call(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if self.fail_every:
+            with self._calls_lock:
+                self._calls += 1
+                failed = self._calls % self.fail_every == 0
+            if failed:
+                raise RuntimeError("429 Resource has been exhausted (simulated quota error)")
+
+    def _message(self, messages: List[BaseMessage], content: str, cls=AIMessage):
+        prompt_tokens = sum(estimate_tokens(str(message.content)) for message in messages)
+        output_tokens = estimate_tokens(content)
+        return cls(content=content, usage_metadata={
+            'input_tokens': prompt_tokens, 'output_tokens': output_tokens,
+            'total_tokens': prompt_tokens + output_tokens,
+        })
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        self._start_call()
+        content = self._respond(str(messages[-1].content))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, content))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        self._start_call()
+        content = self._respond(str(messages[-1].content))
+        tokens = re.findall(r"\S+\s*", content)
+        for index, token in enumerate(tokens):
+            if self.token_latency > 0:
+                time.sleep(self.token_latency)
+            if index == len(tokens) - 1:
+                # Usage is reported once, on the final chunk
+                message = self._message(messages, content, AIMessageChunk)
+                message.content = token
+            else:
+                message = AIMessageChunk(content=token)
+            chunk = ChatGenerationChunk(message=message)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,120 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+from pydantic import ConfigDict, Field
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from utils.terms import STOPWORDS, tokenize
+
+def document_key(doc: Document) -> Hashable:
+    """Identity used to merge the same chunk coming back from different retrievers"""
+    return (doc.metadata.get('source'), doc.page_content)
+
+class BM25Index:
+    """Okapi BM25 over an in-memory inverted index"""
+
+    def __init__(self, documents: Sequence[Document], k1: float = 1.5, b: float = 0.75):
+        self.documents = list(documents)
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.doc_lengths = []
+        for doc_index, doc in enumerate(self.documents):
+            terms = tokenize(doc.page_content)
+            self.doc_lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                self.postings[term].append((doc_index, frequency))
+        self.avg_doc_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        doc_count = len(self.documents)
+        self.idf = {
+            term: math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Return up to k (document index, score) pairs, best first"""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_index, frequency in self.postings[term]:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_index] / (self.avg_doc_length or 1)
+                scores[doc_index] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+def reciprocal_rank_fusion(ranked_lists: Sequence[Sequence[Document]], rrf_k: int = 60) -> List[Document]:
+    """Fuse ranked document lists: score(d) = sum over lists of 1 / (rrf_k + rank)"""
+    scores = defaultdict(float)
+    first_seen = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, 1):
+            key = document_key(doc)
+            scores[key] += 1.0 / (rrf_k + rank)
+            first_seen.setdefault(key, doc)
+    return [first_seen[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+class HybridRetriever(BaseRetriever):
+    """BM25 + vector retrieval fused with reciprocal rank fusion.
+
+    With ``lexical_fast_path`` enabled, a query whose best BM25 hit contains every
+    content term and clearly outscores the runner-up is answered from BM25 alone,
+    skipping the query-embedding round-trip.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vector_retriever: BaseRetriever
+    bm25: BM25Index
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+    lexical_fast_path: bool = False
+    lexical_margin: float = 1.5
+    stats: Dict[str, int] = Field(default_factory=lambda: {'queries': 0, 'lexical_fast_path': 0})
+
+    def _lexically_confident(self, query: str, hits: List[Tuple[int, float]]) -> bool:
+        content_terms = {term for term in tokenize(query) if term not in STOPWORDS}
+        if not hits or not content_terms:
+            return False
+        top_index, top_score = hits[0]
+        top_terms = set(tokenize(self.bm25.documents[top_index].page_content))
+        if not content_terms <= top_terms:
+            return False
+        runner_up = hits[1][1] if len(hits) > 1 else 0.0
+        return top_score >= self.lexical_margin * runner_up
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        self.stats['queries'] += 1
+        hits = self.bm25.search(query, self.fetch_k)
+        lexical_docs = [self.bm25.documents[doc_index] for doc_index, _ in hits]
+
+        if self.lexical_fast_path and self._lexically_confident(query, hits):
+            self.stats['lexical_fast_path'] += 1
+            return lexical_docs[:self.k]
+
+        vector_docs = self.vector_retriever.invoke(query, config={'callbacks': run_manager.get_child()})
+        return reciprocal_rank_fusion([vector_docs, lexical_docs], rrf_k=self.rrf_k)[:self.k]
+
+def documents_from_vectorstore(vectorstore) -> List[Document]:
+    """Rebuild chunk documents from a Chroma collection (used when chunks were streamed, not kept)"""
+    stored = vectorstore.get(include=['documents', 'metadatas'])
+    return [
+        Document(page_content=text, metadata=metadata or {})
+        for text, metadata in zip(stored['documents'], stored['metadatas'])
+    ]
+
+def build_hybrid_retriever(vectorstore, documents: Optional[Sequence[Document]] = None, k: int = 4,
+                           fetch_k: int = 20, rrf_k: int = 60, lexical_fast_path: bool = False) -> HybridRetriever:
+    if documents is None:
+        documents = documents_from_vectorstore(vectorstore)
+    return HybridRetriever(
+        vector_retriever=vectorstore.as_retriever(search_kwargs={'k': fetch_k}),
+        bm25=BM25Index(documents),
+        k=k,
+        fetch_k=fetch_k,
+        rrf_k=rrf_k,
+        lexical_fast_path=lexical_fast_path
+    )
@@ -0,0 +1,200 @@
+"""Shared chat model client: rate limiting, retries and request coalescing.
+
+``LLMClient`` wraps any LangChain chat model and is itself a chat model, so the QA
+chain and the judges use it exactly like the model it wraps. Every call first waits on
+a requests/min and a tokens/min token bucket, failed calls are retried with jittered
+exponential backoff, and identical prompts already in flight share one upstream call.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+from utils.memory import estimate_tokens
+from utils.rate_limit import TokenBucket
+
+LLM_MAX_RETRIES = 3
+# Seconds of quota a burst may use up front; the rest is spread over the minute
+LLM_BURST_SECONDS = 10
+# Callbacks are reported once, by the client; the wrapped model must not inherit them
+# from the surrounding run (that would count every call twice)
+_UNTRACED = {'callbacks': []}
+
+logger = logging.getLogger(__name__)
+
+class _Flight:
+    """One upstream call that concurrent callers with the same prompt wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.message: Optional[AIMessage] = None
+        self.error: Optional[Exception] = None
+
+def _prompt_tokens(messages: List[BaseMessage]) -> int:
+    return sum(estimate_tokens(str(message.content)) for message in messages)
+
+def _output_tokens(message) -> int:
+    usage = getattr(message, 'usage_metadata', None) or {}
+    return usage.get('output_tokens') or estimate_tokens(str(message.content))
+
+class LLMClient(BaseChatModel):
+    """Chat model wrapper adding throttling, retries and single-flight coalescing.
+
+    ``requests_per_minute`` / ``tokens_per_minute`` of None disable that limit. Token
+    usage is estimated from the prompt before the call and topped up with the reported
+    output tokens afterwards. Counters are kept in ``stats`` and, when a ``tracer`` is
+    given, exported as ``llm_client_*`` metrics.
+    """
+
+    model: BaseChatModel
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+    max_retries: int = LLM_MAX_RETRIES
+    base_delay: float = 1.0
+    coalesce: bool = True
+    tracer: Any = None
+
+    _request_bucket: Optional[TokenBucket] = PrivateAttr(default=None)
+    _token_bucket: Optional[TokenBucket] = PrivateAttr(default=None)
+    _flights: Dict[str, _Flight] = PrivateAttr(default_factory=dict)
+    _flights_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _stats_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _stats: Dict[str, float] = PrivateAttr(default_factory=lambda: {
+        'calls': 0, 'retries': 0, 'failures': 0, 'coalesced': 0,
+        'throttle_seconds_requests': 0.0, 'throttle_seconds_tokens': 0.0,
+    })
+
+    def model_post_init(self, __context: Any):
+        super().model_post_init(__context)
+        if self.requests_per_minute:
+            self._request_bucket = TokenBucket.per_minute(
+                self.requests_per_minute, burst=max(1.0, self.requests_per_minute * LLM_BURST_SECONDS / 60))
+        if self.tokens_per_minute:
+            self._token_bucket = TokenBucket.per_minute(
+                self.tokens_per_minute, burst=self.tokens_per_minute * LLM_BURST_SECONDS / 60)
+
+    @property
+    def _llm_type(self) -> str:
+        return "llm-client"
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _count(self, name: str, value: float = 1, **labels):
+        with self._stats_lock:
+            key = f"{name}_{labels['limit']}" if 'limit' in labels else name
+            self._stats[key] += value
+        if self.tracer is not None:
+            self.tracer.add(f"llm_client_{name}_total", value, **labels)
+
+    def _throttle(self, prompt_tokens: int):
+        if self._request_bucket is not None:
+            waited = self._request_bucket.acquire()
+            if waited:
+                self._count('throttle_seconds', waited, limit='requests')
+        if self._token_bucket is not None:
+            waited = self._token_bucket.acquire(prompt_tokens)
+            if waited:
+                self._count('throttle_seconds', waited, limit='tokens')
+        self._count('calls')
+
+    def _settle(self, message):
+        """Charge the output tokens of a finished call to the tokens/min budget"""
+        if self._token_bucket is not None:
+            self._token_bucket.consume(_output_tokens(message))
+
+    def _backoff(self, attempt: int, error: Exception) -> bool:
+        """Sleep before the next attempt; False once retries are exhausted"""
+        if attempt >= self.max_retries:
+            self._count('failures')
+            return False
+        delay = self.base_delay * (2 ** attempt) * (0.5 + random.random())
+        logger.warning(f"LLM call failed ({error}); retrying in {delay:.2f}s")
+        self._count('retries')
+        time.sleep(delay)
+        return True
+
+    def _invoke_with_retry(self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any) -> AIMessage:
+        prompt_tokens = _prompt_tokens(messages)
+        attempt = 0
+        while True:
+            self._throttle(prompt_tokens)
+            try:
+                message = self.model.invoke(messages, _UNTRACED, stop=stop, **kwargs)
+            except Exception as e:
+                if not self._backoff(attempt, e):
+                    raise
+                attempt += 1
+                continue
+            self._settle(message)
+            return message
+
+    @staticmethod
+    def _flight_key(messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]) -> str:
+        return json.dumps([[(message.type, message.content) for message in messages], stop, kwargs],
+                          sort_keys=True, default=str)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        if not self.coalesce:
+            message = self._invoke_with_retry(messages, stop, **kwargs)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+        key = self._flight_key(messages, stop, kwargs)
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if leader:
+            try:
+                flight.message = self._invoke_with_retry(messages, stop, **kwargs)
+            except Exception as e:
+                flight.error = e
+            finally:
+                with self._flights_lock:
+                    del self._flights[key]
+                flight.done.set()
+        else:
+            self._count('coalesced')
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        # Each caller gets its own copy of the shared answer
+        return ChatResult(generations=[ChatGeneration(message=flight.message.model_copy())])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        """Stream from the wrapped model; a call is only retried if it fails before its first token"""
+        prompt_tokens = _prompt_tokens(messages)
+        attempt = 0
+        while True:
+            self._throttle(prompt_tokens)
+            message = None
+            try:
+                for chunk in self.model.stream(messages, _UNTRACED, stop=stop, **kwargs):
+                    message = chunk if message is None else message + chunk
+                    generation = ChatGenerationChunk(message=chunk)
+                    if run_manager:
+                        run_manager.on_llm_new_token(str(chunk.content), chunk=generation)
+                    yield generation
+            except Exception as e:
+                if message is not None:
+                    # Tokens already reached the caller, so a retry would repeat them
+                    self._count('failures')
+                    raise
+                if not self._backoff(attempt, e):
+                    raise
+                attempt += 1
+                continue
+            if message is not None:
+                self._settle(message)
+            return
@@ -1,8 +1,118 @@
-from langchain_community.document_loaders import TextLoader
-from langchain_text_splitters import CharacterTextSplitter
+import glob
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def load_and_split_document(file_path):
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+SEPARATOR = "\n\n"
+SEGMENT_CHARS = 1 << 20
+INGEST_BATCH_SIZE = 256
+TEXT_EXTENSIONS = ('.txt', '.md', '.rst')
+
+def load_and_split_document(file_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    # Imported on use: langchain_community is slow to import and only needed once per run
+    from langchain_community.document_loaders import TextLoader
+    from langchain_text_splitters import CharacterTextSplitter
     loader = TextLoader(file_path)
     docs = loader.load()
-    splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    splitter = CharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
     return splitter.split_documents(docs)
+
+def expand_sources(sources):
+    """Yield the files named by a file path, directory (recursive) or glob, or a list of them"""
+    if isinstance(sources, str):
+        sources = [sources]
+    for source in sources:
+        if os.path.isfile(source):
+            yield source
+        elif os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(TEXT_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            matches = sorted(path for path in glob.glob(source, recursive=True) if os.path.isfile(path))
+            if not matches:
+                raise FileNotFoundError(f"No files match {source}")
+            yield from matches
+
+def iter_file_segments(file_path, segment_chars=SEGMENT_CHARS):
+    """Read a file lazily as (char_offset, text) segments that end on a paragraph break where possible"""
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+        carry = ""
+        offset = 0
+        while True:
+            block = f.read(segment_chars)
+            if not block:
+                break
+            text = carry + block
+            cut = text.rfind(SEPARATOR)
+            # No paragraph break at all: emit the whole text so a segment never exceeds two blocks
+            cut = len(text) if cut <= 0 else cut + len(SEPARATOR)
+            yield offset, text[:cut]
+            offset += cut
+            carry = text[cut:]
+        if carry:
+            yield offset, carry
+
+def _split_segment(file_path, offset, text, chunk_size, chunk_overlap):
+    """Process-pool worker: split one segment into documents carrying source metadata"""
+    from langchain_text_splitters import CharacterTextSplitter
+    splitter = CharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True)
+    docs = splitter.create_documents([text], metadatas=[{'source': file_path}])
+    for doc in docs:
+        doc.metadata['start_index'] += offset
+    return docs
+
+def iter_chunks(sources, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, workers=None, segment_chars=SEGMENT_CHARS):
+    """Lazily read, split and yield chunks from files, directories or globs.
+
+    Segments are split across a process pool; at most two segments per worker are in
+    flight, so memory stays bounded regardless of corpus size. Chunks come out in
+    source order, each tagged with its source, start offset and per-source chunk index.
+    workers=0 splits inline without a pool.
+    """
+    tasks = (
+        (file_path, offset, text)
+        for file_path in expand_sources(sources)
+        for offset, text in iter_file_segments(file_path, segment_chars)
+    )
+    chunk_counters = {}
+
+    def numbered(docs):
+        for doc in docs:
+            source = doc.metadata['source']
+            doc.metadata['chunk_index'] = chunk_counters.get(source, 0)
+            chunk_counters[source] = doc.metadata['chunk_index'] + 1
+            yield doc
+
+    if workers == 0:
+        for task in tasks:
+            yield from numbered(_split_segment(*task, chunk_size, chunk_overlap))
+        return
+
+    max_in_flight = (workers or os.cpu_count() or 1) * 2
+    # Spawned workers: forking a process that already runs warm-up and judge threads can
+    # copy locks held by those threads and deadlock the child
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_split_segment, *task, chunk_size, chunk_overlap))
+            if len(pending) >= max_in_flight:
+                yield from numbered(pending.popleft().result())
+        while pending:
+            yield from numbered(pending.popleft().result())
+
+def iter_chunk_batches(sources, batch_size=INGEST_BATCH_SIZE, **kwargs):
+    """Group iter_chunks output into lists of at most batch_size chunks"""
+    batch = []
+    for doc in iter_chunks(sources, **kwargs):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,77 @@
+import hashlib
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) that needs no tokenizer or API call"""
+    return max(1, len(text) // 4)
+
+class BoundedConversationMemory:
+    """Conversation memory kept within a token budget.
+
+    The most recent turns are kept verbatim in a sliding window. Turns that fall out of
+    the window are dropped, or folded into a rolling summary when ``summarize_fn`` is
+    given. ``max_tokens=None`` keeps every turn, like an unbounded buffer.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = 2000,
+                 summarize_fn: Optional[Callable[[str, List[Tuple[str, str]]], str]] = None):
+        self.max_tokens = max_tokens
+        self.summarize_fn = summarize_fn
+        self.summary = ""
+        self.total_turns = 0
+        self.evicted_turns = 0
+        self._turns = deque()
+        self._window_tokens = 0
+        self._lock = threading.Lock()
+
+    def _add(self, role: str, text: str):
+        with self._lock:
+            tokens = estimate_tokens(text)
+            self._turns.append((role, text, tokens))
+            self._window_tokens += tokens
+            self.total_turns += 1
+            evicted = []
+            if self.max_tokens is not None:
+                # Always keep the newest turn, even if it alone exceeds the budget
+                while self._window_tokens > self.max_tokens and len(self._turns) > 1:
+                    old_role, old_text, old_tokens = self._turns.popleft()
+                    self._window_tokens -= old_tokens
+                    self.evicted_turns += 1
+                    evicted.append((old_role, old_text))
+            summary = self.summary
+
+        if evicted and self.summarize_fn is not None:
+            new_summary = self.summarize_fn(summary, evicted)
+            with self._lock:
+                self.summary = new_summary
+
+    def add_user_message(self, text: str):
+        self._add("Human", text)
+
+    def add_ai_message(self, text: str):
+        self._add("AI", text)
+
+    @property
+    def buffer(self) -> str:
+        """Summary (if any) followed by the verbatim window, in ConversationBufferMemory format"""
+        with self._lock:
+            lines = [f"{role}: {text}" for role, text, _ in self._turns]
+            summary = self.summary
+        if summary:
+            lines.insert(0, f"Summary: {summary}")
+        return "\n".join(lines)
+
+    def digest(self) -> Dict[str, object]:
+        """Small fingerprint of the current memory state for execution logs"""
+        buffer = self.buffer
+        with self._lock:
+            return {
+                'total_turns': self.total_turns,
+                'window_turns': len(self._turns),
+                'window_tokens': self._window_tokens,
+                'evicted_turns': self.evicted_turns,
+                'summarized': bool(self.summary),
+                'sha1': hashlib.sha1(buffer.encode('utf-8')).hexdigest()[:16]
+            }
@@ -0,0 +1,189 @@
+import json
+import os
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+MATRIX_FILE = "embeddings.npy"
+RECORDS_FILE = "records.jsonl"
+ANN_FILE = "ann.npz"
+ANN_MIN_ROWS = 2048
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k best scores along the last axis, best first"""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=-1), axis=-1)
+    return np.take_along_axis(candidates, order, axis=-1)
+
+class NumpyVectorStore(VectorStore):
+    """In-process vector store: an L2-normalized float32 matrix plus a JSONL metadata sidecar.
+
+    Saved stores are opened with ``np.load(mmap_mode='r')`` so startup does not copy the
+    matrix, and cosine top-k is a single matrix-vector product. Meant for single-document
+    and small corpora where Chroma is overkill.
+
+    For large corpora an IVF approximate index can be enabled with ``enable_ann``; it is
+    used once the store holds at least ``ann_min_rows`` vectors and is kept up to date
+    on inserts and deletes. An index saved by an earlier run is loaded and kept in sync,
+    but searches stay exact until ``enable_ann`` is called.
+    """
+
+    def __init__(self, embedding: Embeddings, matrix: Optional[np.ndarray] = None,
+                 records: Optional[List[Dict[str, Any]]] = None):
+        self._embedding = embedding
+        self._records = records or []
+        dimension = matrix.shape[1] if matrix is not None and matrix.ndim == 2 else 0
+        self._matrix = matrix if matrix is not None else np.zeros((0, dimension), dtype=np.float32)
+        self._positions = {record['id']: position for position, record in enumerate(self._records)}
+        self._ann = None
+        self._ann_enabled = False
+        self.ann_min_rows = ANN_MIN_ROWS
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        vectors = _normalize(np.asarray(self._embedding.embed_documents(texts), dtype=np.float32))
+        self._matrix = vectors if len(self._records) == 0 else np.vstack([self._matrix, vectors])
+        if self._ann is not None and self._ann.is_trained:
+            self._ann.add(vectors)
+        for chunk_id, text, metadata in zip(ids, texts, metadatas):
+            self._positions[chunk_id] = len(self._records)
+            self._records.append({'id': chunk_id, 'text': text, 'metadata': metadata or {}})
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        doomed = set(ids)
+        keep = [position for position, record in enumerate(self._records) if record['id'] not in doomed]
+        self._matrix = np.ascontiguousarray(self._matrix[keep])
+        if self._ann is not None and self._ann.is_trained:
+            self._ann.keep_rows(keep)
+        self._records = [self._records[position] for position in keep]
+        self._positions = {record['id']: position for position, record in enumerate(self._records)}
+        return True
+
+    def get(self, ids: Optional[Sequence[str]] = None, include: Optional[Sequence[str]] = None) -> Dict[str, list]:
+        """Chroma-compatible ``get`` so the incremental sync and BM25 rebuild work unchanged"""
+        include = ['documents', 'metadatas'] if include is None else include
+        records = self._records if ids is None else [self._records[self._positions[i]] for i in ids if i in self._positions]
+        result = {'ids': [record['id'] for record in records]}
+        if 'documents' in include:
+            result['documents'] = [record['text'] for record in records]
+        if 'metadatas' in include:
+            result['metadatas'] = [record['metadata'] for record in records]
+        return result
+
+    def _to_document(self, position: int) -> Document:
+        record = self._records[position]
+        return Document(page_content=record['text'], metadata=record['metadata'])
+
+    def enable_ann(self, nlist: Optional[int] = None, nprobe: int = 8, min_rows: int = ANN_MIN_ROWS):
+        """Search through an IVF index, (re)training it when missing, stale or built with another nlist; True if it trained"""
+        from utils.ann_index import IVFIndex
+        self.ann_min_rows = min_rows
+        self._ann_enabled = True
+        if self._ann is None:
+            self._ann = IVFIndex(nlist=nlist, nprobe=nprobe)
+        self._ann.nprobe = nprobe
+        row_count = len(self._records)
+        # A trained index records the bucket count it actually used, capped at the row count
+        nlist_changed = self._ann.is_trained and nlist is not None and min(nlist, row_count) != self._ann.nlist
+        if row_count >= min_rows and (self._ann.needs_training(row_count) or nlist_changed
+                                      or len(self._ann.assignments) != row_count):
+            self._ann.nlist = nlist
+            self._ann.train(self._matrix)
+            return True
+        return False
+
+    def _use_ann(self) -> bool:
+        return (self._ann_enabled and self._ann is not None and self._ann.is_trained and len(self._records) >= self.ann_min_rows
+                and len(self._ann.assignments) == len(self._records))
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        if len(self._records) == 0:
+            return []
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        if self._use_ann():
+            positions = self._ann.candidates(query)
+            scores = self._matrix[positions] @ query
+            return [(self._to_document(int(positions[i])), float(scores[i])) for i in _top_k(scores, k)]
+        scores = self._matrix @ query
+        return [(self._to_document(position), float(scores[position])) for position in _top_k(scores, k)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are cosine similarities in [-1, 1]; map them to [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+    def save(self, directory: str):
+        """Write the matrix and sidecar atomically (temp file + rename)"""
+        os.makedirs(directory, exist_ok=True)
+        matrix = np.array(self._matrix, dtype=np.float32)  # detach from any mmap before replacing the file
+        matrix_tmp = os.path.join(directory, MATRIX_FILE + ".tmp")
+        with open(matrix_tmp, 'wb') as f:
+            np.save(f, matrix)
+        records_tmp = os.path.join(directory, RECORDS_FILE + ".tmp")
+        with open(records_tmp, 'w', encoding='utf-8') as f:
+            for record in self._records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._matrix = matrix
+        os.replace(matrix_tmp, os.path.join(directory, MATRIX_FILE))
+        os.replace(records_tmp, os.path.join(directory, RECORDS_FILE))
+        if self._ann is not None and self._ann.is_trained:
+            ann_tmp = os.path.join(directory, ANN_FILE + ".tmp")
+            self._ann.save(ann_tmp)
+            os.replace(ann_tmp, os.path.join(directory, ANN_FILE))
+
+    @classmethod
+    def load(cls, directory: str, embedding: Embeddings, mmap: bool = True) -> "NumpyVectorStore":
+        matrix_path = os.path.join(directory, MATRIX_FILE)
+        records_path = os.path.join(directory, RECORDS_FILE)
+        if not (os.path.exists(matrix_path) and os.path.exists(records_path)):
+            return cls(embedding)
+        matrix = np.load(matrix_path, mmap_mode='r' if mmap else None)
+        with open(records_path, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        store = cls(embedding, matrix=matrix, records=records)
+        ann_path = os.path.join(directory, ANN_FILE)
+        if os.path.exists(ann_path):
+            from utils.ann_index import IVFIndex
+            store._ann = IVFIndex.load(ann_path)
+        return store
@@ -0,0 +1,128 @@
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+POLICY_DIRECTORY = os.path.join(os.path.dirname(__file__), "policies")
+HARMFUL_PATTERNS_PATH = os.path.join(POLICY_DIRECTORY, "harmful.txt")
+INJECTION_PATTERNS_PATH = os.path.join(POLICY_DIRECTORY, "injection.txt")
+
+REGEX_PREFIX = "re:"
+_END = ""      # trie marker: a term ends here
+_PREFIX = "*"  # trie marker: a prefix wildcard ends here
+
+def _normalize_term(term: str) -> str:
+    return " ".join(term.lower().split())
+
+def _trie_regex(node: Dict) -> str:
+    """Render a character trie as a regex that shares common prefixes between alternatives"""
+    alternatives = []
+    for char in sorted(key for key in node if key not in (_END, _PREFIX)):
+        piece = r"\s+" if char == " " else re.escape(char)
+        alternatives.append(piece + _trie_regex(node[char]))
+    if _PREFIX in node:
+        # The wildcard also matches the bare prefix, so it subsumes an exact end
+        alternatives.append(r"\w*")
+    if not alternatives:
+        return ""
+    body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+    if _END in node and _PREFIX not in node:
+        body = ("(?:" + body + ")" if len(alternatives) == 1 and len(body) > 1 else body) + "?"
+    return body
+
+def read_pattern_file(path: str) -> List[Tuple[Optional[str], str]]:
+    """Read a pattern set as (category, pattern) pairs.
+
+    One rule per line; blank lines and ``#`` comments are skipped, and a ``[category]``
+    header applies to the rules below it.
+    """
+    rules = []
+    category = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("[") and line.endswith("]"):
+                category = line[1:-1].strip() or None
+                continue
+            rules.append((category, line))
+    return rules
+
+class PatternMatcher:
+    """Match thousands of policy terms and a few regexes against a text.
+
+    Plain terms match case-insensitively on whole words ("hack" does not match "hackathon");
+    internal whitespace matches any run of whitespace, and a trailing ``*`` makes the term a
+    word prefix ("hack*" matches "hacking"). Terms are compiled into one trie-shaped
+    alternation, so scan cost tracks the input length rather than the number of terms.
+    Rules starting with ``re:`` are case-insensitive regular expressions. Each is compiled
+    on its own, so inline flags, numbered backreferences and group names behave exactly as
+    they do in a standalone pattern.
+
+    ``rules`` holds pattern strings or (category, pattern) pairs; matches are reported by
+    rule name, ``category:pattern`` when a category is set.
+    """
+
+    def __init__(self, rules: Iterable[Union[str, Tuple[Optional[str], str]]] = ()):
+        self._terms = {}
+        self._prefixes = {}
+        self._regex_rules = []
+        trie = {}
+        for rule in rules:
+            category, pattern = (None, rule) if isinstance(rule, str) else rule
+            self._add_rule(f"{category}:{pattern}" if category else pattern, pattern, trie)
+
+        self._pattern = None
+        if self._terms or self._prefixes:
+            self._pattern = re.compile(r"(?<!\w)" + _trie_regex(trie) + r"(?!\w)", re.IGNORECASE)
+
+    def _add_rule(self, name: str, pattern: str, trie: Dict):
+        if pattern.startswith(REGEX_PREFIX):
+            self._regex_rules.append((name, re.compile(pattern[len(REGEX_PREFIX):], re.IGNORECASE)))
+            return
+        wildcard = pattern.endswith(_PREFIX)
+        term = _normalize_term(pattern.rstrip(_PREFIX))
+        if not term:
+            return
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        if wildcard:
+            node[_PREFIX] = True
+            self._prefixes.setdefault(term, name)
+        else:
+            node[_END] = True
+            self._terms.setdefault(term, name)
+
+    @classmethod
+    def from_files(cls, paths: Iterable[str]) -> "PatternMatcher":
+        rules = []
+        for path in paths:
+            rules.extend(read_pattern_file(path))
+        return cls(rules)
+
+    def __len__(self) -> int:
+        return len(self._terms) + len(self._prefixes) + len(self._regex_rules)
+
+    def _rule_for(self, match: "re.Match") -> str:
+        matched = _normalize_term(match.group(0))
+        if matched in self._terms:
+            return self._terms[matched]
+        # Longest wildcard prefix of the matched word(s)
+        for end in range(len(matched), 0, -1):
+            if matched[:end] in self._prefixes:
+                return self._prefixes[matched[:end]]
+        return matched
+
+    def search(self, text: str) -> Optional[Tuple[str, str]]:
+        """Earliest match as (rule, matched text), or None; at equal positions terms win, then rule order"""
+        first = None
+        if self._pattern is not None:
+            match = self._pattern.search(text)
+            if match:
+                first = (match.start(), self._rule_for(match), match.group(0))
+        for name, pattern in self._regex_rules:
+            match = pattern.search(text)
+            if match and (first is None or match.start() < first[0]):
+                first = (match.start(), name, match.group(0))
+        return first[1:] if first else None
@@ -0,0 +1,42 @@
+import threading
+import time
+
+class TokenBucket:
+    """Thread-safe token bucket; ``rate`` tokens are refilled per second up to ``capacity``"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, amount, burst=None):
+        return cls(amount / 60.0, capacity=burst if burst is not None else max(1.0, amount / 60.0))
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1.0):
+        """Block until ``tokens`` are available and return the number of seconds spent waiting"""
+        # Requests larger than the bucket would never fit, so clamp them to a full bucket
+        tokens = min(float(tokens), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                shortfall = (tokens - self._tokens) / self.rate
+            time.sleep(shortfall)
+            waited += shortfall
+
+    def consume(self, tokens):
+        """Debit ``tokens`` without waiting; the bucket may go negative, delaying later acquires"""
+        with self._lock:
+            self._refill()
+            self._tokens -= float(tokens)
@@ -0,0 +1,93 @@
+import importlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds spent importing heavy modules through timed_import, in first-import order
+IMPORT_TIMINGS: Dict[str, float] = {}
+_import_lock = threading.Lock()
+
+def timed_import(module_name: str):
+    """Import a module on first use, recording how long the first import took"""
+    with _import_lock:
+        if module_name not in IMPORT_TIMINGS:
+            start = time.perf_counter()
+            module = importlib.import_module(module_name)
+            IMPORT_TIMINGS[module_name] = time.perf_counter() - start
+            return module
+    return importlib.import_module(module_name)
+
+class _Component:
+    def __init__(self, factory: Callable[[], Any], depends: Iterable[str]):
+        self.factory = factory
+        self.depends = tuple(depends)
+        self.lock = threading.Lock()
+        self.done = False
+        self.value = None
+        self.error = None
+        self.seconds = None
+
+class ComponentRegistry:
+    """Named, lazily built components with dependencies.
+
+    ``get`` builds a component (after its dependencies) on first use; concurrent callers
+    wait for the build already in progress instead of starting another. A failed build is
+    raised to its caller and retried by the next ``get``. ``warm_up`` builds components on
+    a background thread, so a caller only blocks on what is still missing.
+    """
+
+    def __init__(self):
+        self._components: Dict[str, _Component] = {}
+
+    def register(self, name: str, factory: Callable[[], Any], depends: Iterable[str] = ()):
+        self._components[name] = _Component(factory, depends)
+
+    def get(self, name: str) -> Any:
+        component = self._components[name]
+        if not component.done:
+            for dependency in component.depends:
+                self.get(dependency)
+            with component.lock:
+                if not component.done:
+                    start = time.perf_counter()
+                    try:
+                        component.value = component.factory()
+                    except Exception as e:
+                        component.error = e
+                        raise
+                    finally:
+                        component.seconds = time.perf_counter() - start
+                    component.error = None
+                    component.done = True
+        return component.value
+
+    def build_all(self):
+        """Build every component now, in registration order"""
+        for name in self._components:
+            self.get(name)
+
+    def is_ready(self, name: str) -> bool:
+        return self._components[name].done
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> threading.Thread:
+        """Build the named components (default: all, in registration order) in the background"""
+        order = list(names) if names is not None else list(self._components)
+
+        def build_all():
+            for name in order:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    # Surfaced again to whichever caller needs the component
+                    logger.error(f"Background initialization of {name} failed: {e}")
+
+        thread = threading.Thread(target=build_all, name="warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def timings(self) -> Dict[str, Optional[float]]:
+        """Build time of each component in seconds (None while not built yet)"""
+        return {name: component.seconds for name, component in self._components.items()}
@@ -0,0 +1,16 @@
+"""Lexical term extraction shared by BM25, the ambiguity gate and the context packer.
+
+Kept free of LangChain imports so the lightweight users do not pay for them.
+"""
+import re
+from typing import List
+
+# Tokens keep inner dashes and dots so IDs like "ISO-27001" or "v2.1" survive as one term
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[\-\.][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me of on or tell that the "
+    "their there this to was what when where which who why with you your about".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
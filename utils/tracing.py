@@ -0,0 +1,216 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+from langchain_core.callbacks import BaseCallbackHandler
+
+METRIC_PREFIX = "agent_eval"
+# Upper bounds in seconds; LLM calls dominate, so the range runs from milliseconds to a minute
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+class Histogram:
+    """Fixed-bucket latency histogram (Prometheus semantics: cumulative on export)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate by linear interpolation inside the bucket holding the q-th observation"""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum_seconds': self.sum,
+            'mean_seconds': self.sum / self.count if self.count else None,
+            'max_seconds': self.max if self.count else None,
+            'p50_seconds': self.quantile(0.5),
+            'p95_seconds': self.quantile(0.95),
+            'p99_seconds': self.quantile(0.99),
+        }
+
+class Tracer:
+    """Records timed spans into per-name latency histograms plus labelled counters.
+
+    Spans nest through a context variable, so a span opened inside another records it as
+    its parent; the most recent spans are kept for inspection.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, recent_spans: int = 256):
+        self.buckets = buckets
+        self.histograms = defaultdict(lambda: Histogram(self.buckets))
+        self.counters = defaultdict(float)
+        self.recent = deque(maxlen=recent_spans)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time the enclosed block; the yielded dict can take extra attributes"""
+        record = {'name': name, 'parent': _current_span.get(), 'attributes': attributes}
+        token = _current_span.set(name)
+        start = time.perf_counter()
+        try:
+            yield attributes
+        except BaseException:
+            record['error'] = True
+            raise
+        finally:
+            _current_span.reset(token)
+            self.record(record, time.perf_counter() - start)
+
+    def record(self, record: Dict[str, Any], duration: float):
+        record['duration_seconds'] = duration
+        with self._lock:
+            self.histograms[record['name']].observe(duration)
+            if record.get('error'):
+                self.counters[('span_errors_total', (('span', record['name']),))] += 1
+            self.recent.append(record)
+
+    def add(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def callback_handler(self) -> "TracingCallbackHandler":
+        return TracingCallbackHandler(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = defaultdict(dict)
+            for (name, labels), value in sorted(self.counters.items()):
+                counters[name][",".join(f"{key}={label}" for key, label in labels) or "total"] = value
+            return {
+                'spans': {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())},
+                'counters': dict(counters),
+            }
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        metric = f"{METRIC_PREFIX}_span_duration_seconds"
+        with self._lock:
+            lines.append(f"# HELP {metric} Duration of pipeline stages, retriever and LLM calls.")
+            lines.append(f"# TYPE {metric} histogram")
+            for name, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{metric}_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{span="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{metric}_sum{{span="{name}"}} {histogram.sum}')
+                lines.append(f'{metric}_count{{span="{name}"}} {histogram.count}')
+            declared = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                counter = f"{METRIC_PREFIX}_{name}"
+                if counter not in declared:
+                    lines.append(f"# TYPE {counter} counter")
+                    declared.add(counter)
+                label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+                lines.append(f"{counter}{{{label_text}}} {value}" if label_text else f"{counter} {value}")
+        return "\n".join(lines) + "\n"
+
+def traced(span_name: str):
+    """Method decorator: run the method inside ``self.tracer.span(span_name)``"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.tracer.span(span_name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def _token_usage(response) -> Dict[str, int]:
+    """Input/output token counts from an LLMResult, whichever way the provider reports them"""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, 'message', None), 'usage_metadata', None)
+            if usage:
+                return {'input': usage.get('input_tokens', 0), 'output': usage.get('output_tokens', 0)}
+    usage = (response.llm_output or {}).get('token_usage') or {}
+    if usage:
+        return {'input': usage.get('prompt_tokens', 0), 'output': usage.get('completion_tokens', 0)}
+    return {}
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """LangChain callback handler turning LLM and retriever runs into tracer spans"""
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, name: str, **attributes):
+        with self._lock:
+            self._runs[run_id] = ({'name': name, 'parent': _current_span.get(), 'attributes': attributes},
+                                  time.perf_counter())
+
+    def _end(self, run_id, error: bool = False, **attributes) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            started = self._runs.pop(run_id, None)
+        if started is None:
+            return None
+        record, start = started
+        record['attributes'].update(attributes)
+        if error:
+            record['error'] = True
+        self.tracer.record(record, time.perf_counter() - start)
+        return record
+
+    def on_chat_model_start(self, serialized, messages: List[List[Any]], *, run_id, **kwargs):
+        prompt_chars = sum(len(str(message.content)) for batch in messages for message in batch)
+        self._start(run_id, "llm", prompt_chars=prompt_chars)
+
+    def on_llm_start(self, serialized, prompts: List[str], *, run_id, **kwargs):
+        self._start(run_id, "llm", prompt_chars=sum(len(prompt) for prompt in prompts))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        response_chars = sum(len(generation.text) for generations in response.generations
+                             for generation in generations)
+        usage = _token_usage(response)
+        record = self._end(run_id, response_chars=response_chars, tokens=usage)
+        if record is None:
+            return
+        self.tracer.add("llm_calls_total")
+        self.tracer.add("llm_prompt_chars_total", record['attributes'].get('prompt_chars', 0))
+        self.tracer.add("llm_response_chars_total", response_chars)
+        for kind, count in usage.items():
+            self.tracer.add("llm_tokens_total", count, kind=kind)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=True)
+
+    def on_retriever_start(self, serialized, query: str, *, run_id, **kwargs):
+        self._start(run_id, "retriever", query_chars=len(query))
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        if self._end(run_id, documents=len(documents)) is not None:
+            self.tracer.add("retriever_calls_total")
+            self.tracer.add("retrieved_documents_total", len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=True)